@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import import_country_names, write_data_lake  # noqa: E402
+from fta_charts import render_png, summary_chart_figure, tariff_overview_figure  # noqa: E402
+from fta_data import (  # noqa: E402
+    REGION_SHEETS_START, export_country_name, import_country_rows, import_country_table, import_locations,
+    iter_country_blocks, parse_tariff_range, read_sheet, read_workbook, region_country_tables, segment_region_sheet,
+    summarize_workbook, update_import_index, write_sidecar,
+)
+from fta_projection import project_tariffs  # noqa: E402
+from fta_sourcing import lake_tariffs, rank_sourcing, sourcing_options  # noqa: E402
+
+
+# Times the stages users trigger against a synthetic data lake:
+#   python benchmarks/run.py [--files 8] [--regions 4] [--countries 25] [--repeat 5] [--json results.json]
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(folder, args):
+    excel_files = write_data_lake(folder, args.files, args.regions, args.countries, seed=args.seed)
+    workbooks = {excel_file: pd.read_excel(excel_file, sheet_name=None) for excel_file in excel_files}
+    first_file = excel_files[0]
+    first_workbook = workbooks[first_file]
+    region_sheets = list(first_workbook.values())[REGION_SHEETS_START:]
+    summary = summarize_workbook(first_workbook, 'EXPORT000')
+    # Typed per-country tables, as the app hands them to the charts
+    country_dfs = region_country_tables(summary['tariffs'], summary['regions'][0])
+    # A country from the middle of the last region, so the scan can't stop early
+    import_country = import_country_names(args.regions * args.countries)[-args.countries // 2]
+
+    stages = {
+        'read workbook (xlsx)': lambda: pd.read_excel(first_file, sheet_name=None),
+        'read one region sheet (streaming)': lambda: read_sheet(first_file, list(first_workbook)[REGION_SHEETS_START]),
+        'first country block (streaming)': lambda: next(iter_country_blocks(first_file, list(first_workbook)[REGION_SHEETS_START])),
+        'segment region sheets': lambda: [segment_region_sheet(sheet_df) for sheet_df in region_sheets],
+        'parse tariff ranges': lambda: [parse_tariff_range(summary['overview'][c]) for c in ('MFN Tariff', 'FTA Tariff')],
+        'country specific scan (in memory)': lambda: [
+            import_country_rows(workbook, import_country, export_country_name(excel_file))
+            for excel_file, workbook in workbooks.items()
+        ],
+        'plotly figures (one region)': lambda: [
+            tariff_overview_figure(country, df) for country, df in country_dfs.items()
+        ],
+        'matplotlib summary chart (render)': lambda: render_png(summary_chart_figure(summary['overview'])),
+    }
+
+    try:
+        write_sidecar(first_file)
+        stages['read workbook (sidecar)'] = lambda: read_workbook(first_file)
+    except RuntimeError:
+        print("pyarrow not installed, skipping the sidecar read stage")
+
+    # Reads the country's blocks through the index: sliced from the sidecar of the first workbook, streamed from the others
+    index = update_import_index(folder)
+    locations = import_locations(index)
+    stages['country specific lookup (index)'] = lambda: import_country_table(folder, index, locations, import_country)
+
+    tariffs = lake_tariffs(folder)
+    ranking = rank_sourcing(tariffs)
+    stages['best sourcing (rank whole lake)'] = lambda: rank_sourcing(tariffs)
+    stages['best sourcing (query)'] = lambda: sourcing_options(ranking, [import_country], top=3)
+    stages['phase-down projection (whole lake)'] = lambda: project_tariffs(tariffs)
+
+    results = {}
+    for name, function in stages.items():
+        timings = timed(function, args.repeat)
+        results[name] = {'median': statistics.median(timings), 'min': min(timings)}
+        print(f"{name:<40} median {results[name]['median'] * 1000:10.2f} ms   min {results[name]['min'] * 1000:10.2f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FTA app's data and chart stages on synthetic workbooks.")
+    parser.add_argument('--files', type=int, default=8, help="number of export-country workbooks")
+    parser.add_argument('--regions', type=int, default=4, help="region sheets per workbook")
+    parser.add_argument('--countries', type=int, default=25, help="import countries per region sheet")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per stage")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    print(f"{args.files} files x {args.regions} regions x {args.countries} countries, {args.repeat} runs per stage")
+    with tempfile.TemporaryDirectory() as folder:
+        results = run(folder, args)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
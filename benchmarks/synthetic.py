@@ -0,0 +1,89 @@
+import os
+import random
+
+from openpyxl import Workbook
+
+
+# Synthetic FTA_data workbooks with the layout the app expects: a summary sheet, a negotiations sheet,
+# then region sheets where Country/Region and Vehicle Type are only filled on the first row of their block
+# and the max tariff sits under an empty header cell (read back by pandas as 'Unnamed: 4').
+
+VEHICLE_TYPES = ['Others', 'BEV', 'PHEV', 'HEV', 'ICE']
+TARIFF_TYPES = ['MFN', 'FTA']
+
+SUMMARY_HEADER = ['Country/Region', 'LC', 'MFN Tariff', 'FTA Tariff']
+NEGOTIATIONS_HEADER = ['Country/Region', 'FTA Name', 'Negotiation Status', 'Notes', 'Last Update']
+REGION_HEADER = [
+    'Country/Region', 'Vehicle Type', 'Tariff Type', 'Tariff Rate', None, 'Exceptions/Notes',
+    'Tariff Reduction Years', 'Reduction Rate%', 'EiF', 'LC 40%',
+]
+
+
+def _tariff_text(rng):
+    # Mix of the formats found in real summary sheets: ranges, 'NA' and plain numbers
+    kind = rng.random()
+    if kind < 0.4:
+        low = round(rng.uniform(0, 10), 1)
+        return f"{low}-{round(low + rng.uniform(0, 20), 1)}"
+    if kind < 0.5:
+        return 'NA'
+    return round(rng.uniform(0, 30), 1)
+
+
+def import_country_names(count):
+    return [f"Country {i:04d}" for i in range(count)]
+
+
+def write_workbook(path, regions, countries_per_region, rng):
+    workbook = Workbook(write_only=True)
+    names = import_country_names(regions * countries_per_region)
+
+    summary = workbook.create_sheet('Overview')
+    summary.append(SUMMARY_HEADER)
+    for name in names:
+        summary.append([name, f"{rng.choice([35, 40, 45, 55])}%", _tariff_text(rng), _tariff_text(rng)])
+
+    negotiations = workbook.create_sheet('FTA Negotiations')
+    negotiations.append(NEGOTIATIONS_HEADER)
+    for name in rng.sample(names, k=max(1, len(names) // 10)):
+        negotiations.append([
+            name, f"{name} FTA", rng.choice(['Ongoing', 'Paused', 'Concluded']),
+            "Synthetic negotiation notes", f"2024-{rng.randint(1, 12):02d}-01",
+        ])
+
+    for region in range(regions):
+        sheet = workbook.create_sheet(f"Region {region}")
+        sheet.append(REGION_HEADER)
+        for name in names[region * countries_per_region:(region + 1) * countries_per_region]:
+            first_country_row = True
+            for vehicle_type in VEHICLE_TYPES:
+                for position, tariff_type in enumerate(TARIFF_TYPES):
+                    low = round(rng.uniform(0, 10), 1)
+                    sheet.append([
+                        name if first_country_row else None,
+                        vehicle_type if position == 0 else None,
+                        tariff_type,
+                        low,
+                        round(low + rng.uniform(0, 20), 1),
+                        rng.choice([None, "Quota applies", "Luxury surcharge"]),
+                        rng.choice([None, 5, 10]),
+                        rng.choice([None, 10, 20]),
+                        rng.choice([None, "2021-01-01", "2023-07-01"]),
+                        None,
+                    ])
+                    first_country_row = False
+
+    workbook.save(path)
+
+
+def write_data_lake(folder, files, regions, countries_per_region, seed=0):
+    # Same seed, same data: benchmark runs stay comparable. Not the same bytes, openpyxl stamps the save time into the
+    # document properties and zip entries, so the content hashes differ between runs
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for index in range(files):
+        path = os.path.join(folder, f"export{index:03d}.xlsx")
+        write_workbook(path, regions, countries_per_region, rng)
+        paths.append(path)
+    return paths
@@ -0,0 +1,58 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+
+
+# Startup budget check for app replicas: imports fta.py in a fresh interpreter (which renders the
+# default landing page in Streamlit's bare mode) and fails when it is too slow, too big, or pulls
+# in a heavy dependency that only some views need.
+#   python check_startup.py [--max-seconds 3] [--max-rss-mb 300]
+
+# Modules that must stay off the cold path
+HEAVY_MODULES = ['geopandas', 'streamlit_folium', 'matplotlib', 'plotly']
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import fta
+print(json.dumps({{'seconds': time.perf_counter() - start, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure():
+    child = subprocess.run(
+        [sys.executable, '-c', CHILD.format(heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    )
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    # ru_maxrss is reported in kilobytes on Linux
+    result['rss_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when a cold import of the app exceeds its startup budget.")
+    parser.add_argument('--max-seconds', type=float, default=3.0, help="import time budget in seconds")
+    parser.add_argument('--max-rss-mb', type=float, default=300.0, help="peak resident memory budget in MB")
+    args = parser.parse_args(argv)
+
+    result = measure()
+    print(f"cold import: {result['seconds']:.2f}s, peak RSS {result['rss_mb']:.0f} MB")
+
+    failures = []
+    if result['seconds'] > args.max_seconds:
+        failures.append(f"import took {result['seconds']:.2f}s (budget {args.max_seconds:.2f}s)")
+    if result['rss_mb'] > args.max_rss_mb:
+        failures.append(f"peak RSS {result['rss_mb']:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+    if result['heavy']:
+        failures.append(f"heavy modules imported at startup: {', '.join(result['heavy'])}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,33 @@
 import streamlit as st
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import numpy as np
-import geopandas as gpd
-from streamlit_folium import st_folium
-import plotly.graph_objects as go
+import json
+import time
+import datetime
+import math
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fta_charts import (
+    figure_key, phase_down_figure, region_heatmap_json, sourcing_figure, summary_chart_png, tariff_figure_json,
+)
+from fta_data import (
+    TARIFF_SCHEMA, filter_negotiations, import_locations, iter_import_country_rows, negotiation_records,
+    read_country_rows, read_summary_tables, region_country_tables, sort_negotiations, update_import_index,
+)
+from fta_export import EXPORT_FORMATS, export_lake, write_export
+from fta_metrics import metrics
+from fta_projection import project_tariffs, tariff_in_year
+from fta_sourcing import lake_tariffs, rank_sourcing, sourcing_options
+from fta_sql import lake_tables, query, sql_available, table_columns
+from fta_watch import WorkbookCatalog
 
 
+# Parsed tables are shared by every session through st.cache_resource instead of being copied into each one, so they
+# are never modified in place: views filter them (boolean masks copy the rows) and derive new frames with assign or concat.
+
+# Wall time of the whole rerun, recorded at the bottom of the script
+rerun_start = time.perf_counter()
 
 # Set the page configuration
 st.set_page_config(
@@ -51,13 +71,206 @@ st.markdown(
 # Set the folder path containing the FTA data
 fta_data_folder = "FTA_data"
 
+# Maximum number of parsed workbooks kept in memory (least recently used are evicted first)
+WORKBOOK_CACHE_ENTRIES = 32
+
+# Maximum number of serialized region charts kept in memory
+FIGURE_CACHE_ENTRIES = 512
+
+# Minimum seconds between redraws of a table that is still streaming in
+REDRAW_INTERVAL = 0.25
+
+# Negotiations shown per page
+NEGOTIATION_PAGE_SIZES = [12, 24, 48, 96]
+
+# Fields listed in a negotiation card, and the HTML around them
+NEGOTIATION_CARD_FIELDS = ['FTA Name', 'Negotiation Status', 'Notes', 'Last Update']
+NEGOTIATION_CARD_TITLE = (
+    """<div style="background-color: white; color: #4c72b0; padding: 0px; box-shadow: 10px 10px 4px rgba(0, 0, 0, 0.25);border-radius: 50px; text-align: center; font-weight: bold;">"""
+    """<h2 style="text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.5); font-size: 20px; font-weight: bold;">{}</h2></div>"""
+)
+NEGOTIATION_CARD_BODY = (
+    """<div style="background-color: #ffffff; color: #000000; padding: 20px; border-radius: 20px; box-shadow: 10px 10px 4px rgba(0, 0, 0, 0.25); margin-bottom: 10px; display: flex; justify-content: center;">"""
+    """<table style="width: 100%; font-size: 14px;">{}</table></div>"""
+)
+NEGOTIATION_CARD_ROW = """<tr><th style="text-align: left;">{}</th><td style="word-break: break-word;">"""
+
+
+# Normalized per-export-country tables with categorical country, region, vehicle and tariff type columns,
+# compiled offline by `fta_build.py tables` or summarized from the workbook on a miss.
+# They are shared by every session; the mtime and size are part of the cache key, so an entry is only invalidated
+# when the file changes on disk.
+@st.cache_resource(max_entries=WORKBOOK_CACHE_ENTRIES, show_spinner="Loading the export country...")
+def _read_summary_tables(excel_file, mtime_ns, size):
+    metrics.cache_miss('summary_tables')
+    return read_summary_tables(excel_file)
+
+
+def load_summary_tables(excel_file):
+    metrics.cache_lookup('summary_tables')
+    stat = os.stat(excel_file)
+    return _read_summary_tables(excel_file, stat.st_mtime_ns, stat.st_size)
+
+
+# Year-by-year FTA phase-down of every tariff row of a workbook, computed once per version of the workbook
+@st.cache_resource(max_entries=WORKBOOK_CACHE_ENTRIES, show_spinner=False)
+def _load_projection(excel_file, mtime_ns, size):
+    metrics.cache_miss('projection')
+    return project_tariffs(load_summary_tables(excel_file)['tariffs'])
+
+
+def load_projection(excel_file):
+    metrics.cache_lookup('projection')
+    stat = os.stat(excel_file)
+    return _load_projection(excel_file, stat.st_mtime_ns, stat.st_size)
+
+
+# Negotiation records, with their cards rendered once per version of the workbook instead of on every rerun
+@st.cache_resource(max_entries=WORKBOOK_CACHE_ENTRIES, show_spinner=False)
+def _load_negotiation_records(excel_file, mtime_ns, size):
+    metrics.cache_miss('negotiations')
+    records = negotiation_records(load_summary_tables(excel_file)['negotiations'])
+    title_start, title_end = NEGOTIATION_CARD_TITLE.split('{}')
+    body_start, body_end = NEGOTIATION_CARD_BODY.split('{}')
+    body = body_start
+    for field in NEGOTIATION_CARD_FIELDS:
+        body = body + NEGOTIATION_CARD_ROW.format(field) + records[field].astype(str) + "</td></tr>"
+    return records.assign(
+        _card_title=title_start + records['Country/Region'].astype(str) + title_end,
+        _card_body=body + body_end,
+    )
+
+
+def load_negotiation_records(excel_file):
+    metrics.cache_lookup('negotiations')
+    stat = os.stat(excel_file)
+    return _load_negotiation_records(excel_file, stat.st_mtime_ns, stat.st_size)
+
+
+# Region charts are cached as serialized figures keyed by the content hash of their country table;
+# `fta_build.py figures` warms the on-disk cache for every export, region and import country ahead of time
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _load_tariff_figure(key, country, _df):
+    metrics.cache_miss('figure')
+    return json.loads(tariff_figure_json(country, _df, fta_data_folder, key))
+
+
+def load_tariff_figure(country, df):
+    metrics.cache_lookup('figure')
+    return _load_tariff_figure(figure_key('tariff_overview', country, df), country, df)
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _load_region_heatmap(key, _tariffs, region):
+    metrics.cache_miss('figure')
+    return json.loads(region_heatmap_json(_tariffs, region, fta_data_folder, key))
+
+
+def load_region_heatmap(tariffs, region):
+    metrics.cache_lookup('figure')
+    rows = tariffs[tariffs['Region'] == region]
+    return _load_region_heatmap(figure_key('region_heatmap', region, rows), rows, region)
+
+
+# The summary chart is cached as PNG bytes keyed by the content hash of the summary sheet
+@st.cache_data(max_entries=WORKBOOK_CACHE_ENTRIES, show_spinner=False)
+def _load_summary_chart(key, _sheet_df):
+    metrics.cache_miss('figure')
+    return summary_chart_png(_sheet_df, fta_data_folder, key)
+
+
+def load_summary_chart(sheet_df):
+    metrics.cache_lookup('figure')
+    return _load_summary_chart(figure_key('summary_chart', sheet_df), sheet_df)
+
+
+# One catalog of the workbooks per process, kept current by a background watcher instead of listing the folder on every rerun
+@st.cache_resource(show_spinner=False)
+def workbook_catalog(folder):
+    return WorkbookCatalog(folder).start()
+
+
+# The import-country index is updated incrementally whenever the catalog sees a workbook added, removed or modified
+@st.cache_resource(max_entries=2, show_spinner="Indexing the workbooks...")
+def _load_import_index(folder, catalog_version):
+    metrics.cache_miss('import_index')
+    index = update_import_index(folder)
+    return index, import_locations(index)
+
+
+def load_import_index(folder):
+    metrics.cache_lookup('import_index')
+    return _load_import_index(folder, workbook_catalog(folder).version)
+
+
+# Best-sourcing ranking of every import market across the lake, recomputed whenever the catalog sees a workbook change
+@st.cache_resource(max_entries=2, show_spinner="Ranking the sourcing options...")
+def _load_sourcing_ranking(folder, catalog_version):
+    metrics.cache_miss('sourcing')
+    return rank_sourcing(lake_tariffs(folder, read_tables=load_summary_tables))
+
+
+def load_sourcing_ranking(folder):
+    metrics.cache_lookup('sourcing')
+    return _load_sourcing_ranking(folder, workbook_catalog(folder).version)
+
+
+# Per-workbook tables behind the SQL views, memory-mapped from the compiled Feather files where possible
+@st.cache_resource(max_entries=2, show_spinner="Opening the data lake...")
+def _load_lake_tables(folder, catalog_version):
+    metrics.cache_miss('lake_tables')
+    sha256s = {entry.path: entry.sha256 for entry in workbook_catalog(folder).entries().values()}
+    return lake_tables(folder, sha256s, read_tables=load_summary_tables)
+
+
+def load_lake_tables(folder):
+    metrics.cache_lookup('lake_tables')
+    return _load_lake_tables(folder, workbook_catalog(folder).version)
+
+
+# Read only one country's row block, from the sidecar when available and otherwise streamed from its sheet
+@st.cache_resource(max_entries=256, show_spinner=False)
+def _load_country_rows(excel_file, sheet_name, start, stop, sha256):
+    metrics.cache_miss('country_rows')
+    return read_country_rows(excel_file, sheet_name, start, stop, sha256)
+
+
+def load_country_rows(excel_file, sheet_name, start, stop, sha256):
+    metrics.cache_lookup('country_rows')
+    return _load_country_rows(excel_file, sheet_name, start, stop, sha256)
+
+
+# Whole-lake exports are written by one background thread per server so they never hold up a session (a process pool
+# would re-run this script in every worker). The jobs are shared by every session and keyed by format and catalog
+# version, so a finished export is handed out until a workbook changes.
+@st.cache_resource(show_spinner=False)
+def lake_exports():
+    return {'pool': ThreadPoolExecutor(max_workers=1, thread_name_prefix='lake-export'), 'jobs': {}}
+
+
+def download_controls(sheets, file_name, key, sheet_column=None, schema=None):
+    # The file is only written when asked for, chunk by chunk into a temporary file. download_button still reads the whole
+    # file into Streamlit's media store to serve it; large exports are better fetched from the HTTP API's download routes
+    export_format = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_export_format_selectbox")
+    if st.button("Prepare download", key=f"{key}_prepare_download_button"):
+        with tempfile.TemporaryFile() as f, st.spinner("Writing the file..."):
+            write_export(sheets, export_format, f, sheet_column, schema)
+            f.seek(0)
+            st.download_button(
+                f"Download {file_name}.{export_format}", f, file_name=f"{file_name}.{export_format}",
+                mime=EXPORT_FORMATS[export_format], key=f"{key}_download_button",
+            )
+
+
 # Get the list of unique Excel file names (without the .xlsx extension and in uppercase, excluding temporary files)
-excel_files = [os.path.splitext(f)[0].upper() for f in os.listdir(fta_data_folder) if f.endswith('.xlsx') and not f.startswith('~$')]
-excel_files = list(set(excel_files))
+excel_files = workbook_catalog(fta_data_folder).export_countries()
 
 # Create the main options for the user
 st.markdown("## Select Suitable Operation")
 view_options = ["General Overview", "Country Specific"]
+# Ad-hoc SQL across all export countries, when duckdb is installed
+if sql_available():
+    view_options.append("SQL Query")
 selected_view = st.radio("Select View", view_options, key="selected_view_radio")
 
 # Create the sidebar based on the selected view
@@ -77,11 +290,10 @@ with st.sidebar:
             # Get the list of sheets in the selected Excel file
             excel_file = os.path.join(fta_data_folder, f"{source_country.lower()}.xlsx")
             if os.path.exists(excel_file):
-                df = pd.read_excel(excel_file, sheet_name=None)
-                sheet_names = list(df.keys())
+                summary = load_summary_tables(excel_file)
 
-                # Skip the first 2 sheets
-                sheet_names = sheet_names[2:]
+                # The region sheets (everything after the summary and negotiations sheets)
+                sheet_names = summary['regions']
 
                 # Create a selectbox for the user to select the sheet in the sidebar
                 st.markdown("## Select Import Region")
@@ -111,20 +323,12 @@ with st.sidebar:
             # Load the selected export country Excel file
             excel_file = os.path.join(fta_data_folder, f"{export_country.lower()}.xlsx")
             if os.path.exists(excel_file):
-                df = pd.read_excel(excel_file, sheet_name=None)
-                
-                # Ensure that the selected import country is properly defined
-                unique_country_names = set()  # Use a set to automatically handle uniqueness
-
-                # Iterate through the sheets to collect unique import country names
-                sheet_names = list(df.keys())
-                for sheet_name in sheet_names[2:]:  # Skip first 2 sheets
-                    sheet_df = df[sheet_name]
-                    if 'Country/Region' in sheet_df.columns:
-                        unique_country_names.update([str(x) for x in sheet_df['Country/Region'].unique()])
-
-                # Convert the set back to a sorted list for displaying in the dropdown
-                unique_country_names = sorted(list(unique_country_names))
+                # Import countries of the selected export country, from the shared index instead of the whole workbook
+                _, locations = load_import_index(fta_data_folder)
+                unique_country_names = sorted(
+                    country for country, blocks in locations.items()
+                    if any(block[1] == export_country for block in blocks)
+                )
 
                 # Create a dropdown for selecting the Import Country
                 st.markdown("## Select Import Country")
@@ -135,87 +339,56 @@ with st.sidebar:
                     label_visibility="collapsed"
                 )
 
-                # If an import country is selected, proceed with processing the data
-                if selected_import_country:
-                    try:
-                        # Process and display data for the selected import country
-                        country_specific_dfs = []  # List to store rows for the selected import country
-
-                        # Iterate through the sheets and filter the data for the selected import country
-                        for sheet_name in sheet_names[2:]:  # Skip the first two sheets
-                            sheet_df = df[sheet_name]
-                            if 'Country/Region' in sheet_df.columns:
-                                # Get the rows for the selected import country
-                                start_idx = sheet_df[sheet_df['Country/Region'] == selected_import_country].index
-                                
-                                if not start_idx.empty:
-                                    start_idx = start_idx[0]  # First index of the selected country
-
-                                    # Iterate through rows from start_idx onwards
-                                    for idx in range(start_idx, len(sheet_df)):
-                                        if pd.notnull(sheet_df.loc[idx, 'Country/Region']) and sheet_df.loc[idx, 'Country/Region'] != selected_import_country:
-                                            break  # Stop when a new country appears
-                                        country_specific_dfs.append(sheet_df.iloc[idx])
-
-                        # Convert the list of rows into a DataFrame and display it
-                        if country_specific_dfs:
-                            combined_df = pd.DataFrame(country_specific_dfs)
-                            
-                        else:
-                            st.warning(f"No data found for {selected_import_country}.")
-
-                    except Exception as e:
-                        st.error(f"Error processing data for {selected_import_country}: {e}")
-
             else:
                 st.warning(f"No Excel file found for {export_country.upper()}.")
         else:
             st.warning("Please select an Export (Production Country).")
 
+    elif selected_view == "SQL Query":
+        # The views and their columns, to write queries against
+        st.markdown("## Tables")
+        for table_name, columns in table_columns(load_lake_tables(fta_data_folder)).items():
+            with st.expander(table_name):
+                st.markdown("\n".join(f"- `{column}`" for column in columns))
+
+    # The tariff tables of every export country in one file, one sheet per export country in Excel
+    with st.expander("Export Whole Lake"):
+        lake_format = st.selectbox("Format", list(EXPORT_FORMATS), key="lake_export_format_selectbox")
+        exports = lake_exports()
+        job_key = (lake_format, workbook_catalog(fta_data_folder).version)
+        job = exports['jobs'].get(job_key)
+        if job is None and st.button("Start export", key="lake_export_button"):
+            job = exports['jobs'][job_key] = exports['pool'].submit(export_lake, fta_data_folder, lake_format)
+        if job is not None:
+            if not job.done():
+                st.info("The export is being written in the background.")
+                st.button("Check again", key="lake_export_check_button")
+            elif job.exception() is not None:
+                # Dropped so the export can be started again
+                exports['jobs'].pop(job_key, None)
+                st.error(f"The export failed: {job.exception()}")
+            else:
+                with open(job.result(), 'rb') as f:
+                    st.download_button(
+                        f"Download fta_lake.{lake_format}", f, file_name=f"fta_lake.{lake_format}",
+                        mime=EXPORT_FORMATS[lake_format], key="lake_export_download_button",
+                    )
+
 
 
 if selected_view == "General Overview":
 
     if source_country and selected_sheet:
         try:
-            sheet_df = df[selected_sheet]
-        
-            # Create separate dataframes for each country/region
-            country_dfs = {}
-            current_country = None
-            for _, row in sheet_df.iterrows():
-                country_region = row['Country/Region']
-                if pd.notnull(country_region):
-                    current_country = country_region
-                
-                if current_country not in country_dfs:
-                    country_dfs[current_country] = pd.DataFrame(columns=['Vehicle Type', 'Tariff Type', 'Tariff Min.', 'Tariff Max.', 'Exceptions/Notes', 'Tariff Reduction Years', 'Reduction Rate%', 'EiF'])
-                
-                # Fill in the missing Vehicle Type values
-                if pd.isnull(row['Vehicle Type']):
-                    row['Vehicle Type'] = country_dfs[current_country]['Vehicle Type'].iloc[-1] if len(country_dfs[current_country]) > 0 else ''
-                
-                country_dfs[current_country] = pd.concat([country_dfs[current_country], pd.DataFrame({
-                    'Vehicle Type': [row['Vehicle Type']],
-                    'Tariff Type': [row['Tariff Type']],
-                    'Tariff Min.': [row['Tariff Rate']],
-                    'Tariff Max.': [row['Unnamed: 4']],
-                    'Exceptions/Notes': [row['Exceptions/Notes']],
-                    'Tariff Reduction Years': [row['Tariff Reduction Years']],
-                    'Reduction Rate%': [row['Reduction Rate%']],
-                    'EiF': [row['EiF']]
-                })], ignore_index=True)
-            # Assuming 'country_dfs' is ready and contains valid DataFrame for each country.
-                
-            # Assuming 'country_dfs' is ready and contains valid DataFrame for each country.
-            print(country_dfs)
+            if selected_sheet in summary['region_errors']:
+                raise ValueError(summary['region_errors'][selected_sheet])
+
+            # Separate dataframes for each country/region, precomputed by the summary tables
+            country_dfs = region_country_tables(summary['tariffs'], selected_sheet)
+
             # Display the graphs
             # Check if there is an 'LC' column in the DataFrame
-            lc_column = None
-            for col in sheet_df.columns:
-                if str(col).startswith("LC"):
-                    lc_column = col
-                    break
+            lc_column = summary['region_lc'].get(selected_sheet)
 
                 # Display the LC details in a small box on the right side
             if lc_column is not None:
@@ -229,223 +402,62 @@ if selected_view == "General Overview":
                     unsafe_allow_html=True
                 )
 
-            for country, df in country_dfs.items():
-                st.markdown(
-                    f"""
-                    <div style="text-align: center; margin-top: 10px;">
-                        <h1 style="font-size: 40px; font-weight: bold; color: #ffffff; text-shadow: 4px 4px 0 #1a237e, 6px 6px 0 rgba(0, 0, 0, 0.5); font-family: 'Arial Black', sans-serif;">{country.upper()}</h1>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
+            # Cells of this region that didn't fit the tariff schema, shown as missing values in the charts
+            region_issues = summary['tariff_issues'][summary['tariff_issues']['Region'] == selected_sheet]
+            if not region_issues.empty:
+                with st.expander(f"{len(region_issues)} malformed cells in {selected_sheet}"):
+                    st.dataframe(region_issues, hide_index=True)
+
+            # The region's per-country tables as one file, one sheet per import country in Excel
+            with st.expander(f"Download {selected_sheet}"):
+                download_controls(
+                    country_dfs.items(), f"{source_country.upper()}_{selected_sheet}", "region",
+                    sheet_column='Import Country', schema=TARIFF_SCHEMA,
                 )
 
-                try:
-                    # Filter the data
-                    filtered_data = df.copy()
-
-                    # Replace NaN values in 'Tariff Min.' and 'Tariff Max.' with reasonable defaults (like 0 or any other value that makes sense for your use case)
-                    filtered_data['Tariff Min.'] = filtered_data['Tariff Min.'].fillna(0)
-                    filtered_data['Tariff Max.'] = filtered_data['Tariff Max.'].fillna(0)
-
-                    # Create a categorical type for sorting
-                    vehicle_order = ['Others', 'BEV', 'PHEV', 'HEV', 'ICE']
-                    filtered_data['Vehicle Type'] = pd.Categorical(filtered_data['Vehicle Type'], categories=vehicle_order, ordered=True)
-
-                    # Sort the DataFrame based on the custom order
-                    filtered_data = filtered_data.sort_values('Vehicle Type')
-
-                    # Prepare the Plotly figure
-                    fig = go.Figure()
-
-                    # Define the width of the bars
-                    bar_width = 0.3  # Width of each bar
-
-                    # Flags to add legend entries once
-                    mfn_legend_added = False
-                    fta_legend_added = False
-
-                
-                    
-                    # Loop through the vehicle types
-                    for vehicle_type in vehicle_order:
-                        vehicle_data = filtered_data[filtered_data['Vehicle Type'] == vehicle_type]
-
-                        # Calculate MFN tariffs
-                        mfn_row = vehicle_data[vehicle_data['Tariff Type'] == 'MFN']
-                        if not mfn_row.empty:
-                            mfn_min = mfn_row['Tariff Min.'].values[0]
-                            mfn_max = mfn_row['Tariff Max.'].values[0]
-                            mfn_exceptions = mfn_row['Exceptions/Notes'].values[0] or 'None'
-                            mfn_reduction_rate = mfn_row['Reduction Rate%'].values[0] or 'N/A'
-                            mfn_eff_date = mfn_row['EiF'].values[0] or 'N/A'
-
-                            if mfn_min == 0 and mfn_max == 0:
-                                mfn_mean = 0
-                                mfn_error = 0
-                                mfn_text = "<b><span style='color:blue;font-size:16px'>MFN = 0</span></b>"
-                            else:
-                                mfn_mean = (mfn_min + mfn_max) / 2  # Calculate the mean
-                                mfn_error = (mfn_max - mfn_min) / 2  # Error is half the range
-                                mfn_text = f"MFN: {mfn_min} - {mfn_max}"
-
-                            fig.add_trace(go.Bar(
-                                y=[vehicle_type],
-                                x=[mfn_mean],
-                                name='MFN Tariff' if not mfn_legend_added else None,  # Add legend only once
-                                orientation='h',
-                                width=bar_width,  # Set bar width
-                                offset=-bar_width/2,  # Shift to the left for MFN
-                                marker=dict(color='rgba(31, 119, 180, 0.5)'),  # Adjusted opacity for MFN
-                                error_x=dict(
-                                    type='data',
-                                    array=[mfn_error],
-                                    arrayminus=[mfn_error],
-                                    width=0,
-                                    color='rgba(31, 119, 180, 1)',  # Color of the error bars for MFN
-                                    thickness=36
-                                ),
-                                text=[mfn_text],
-                                textposition='outside',
-                                hovertemplate=(
-                                    f"<b>Vehicle Type: {vehicle_type}</b><br>" +
-                                    f"{mfn_text}<br>" +
-                                    f"Exceptions/Notes: {mfn_exceptions}<br>" +
-                                    f"Reduction Rate: {mfn_reduction_rate}%<br>" +
-                                    f"Effective Date (EiF): {mfn_eff_date}"
-                                ),
-                                showlegend=not mfn_legend_added  # Show legend only once for MFN
-                            ))
-                            mfn_legend_added = True  # Mark MFN legend as added
-
-                        # Calculate FTA tariffs
-                        fta_row = vehicle_data[vehicle_data['Tariff Type'] == 'FTA']
-                        if not fta_row.empty:
-                            fta_min = fta_row['Tariff Min.'].values[0] if pd.notna(fta_row['Tariff Min.'].values[0]) else 0
-                            fta_max = fta_row['Tariff Max.'].values[0]
-                            fta_exceptions = fta_row['Exceptions/Notes'].values[0] or 'None'
-                            fta_reduction_rate = fta_row['Reduction Rate%'].values[0] or 'N/A'
-                            fta_eff_date = fta_row['EiF'].values[0] or 'N/A'
-
-                            if fta_min == 0 and fta_max == 0:
-                                fta_mean = 0
-                                fta_error = 0
-                                fta_text = "<b><span style='color:green;font-size:16px'>FTA = 0</span></b>"
-                            elif fta_max == 0:
-                                fta_mean = fta_min
-                                fta_error = 0
-                                fta_text = "<b><span style='color:orange;font-size:16px'>FTA = Out of Scope</span></b>"
-                            else:
-                                fta_mean = fta_max  # Using max for FTA
-                                fta_error = (fta_max - fta_min) / 2  # Error is half the range
-                                fta_text = f"FTA: {fta_min} - {fta_max}"
-
-                            fig.add_trace(go.Bar(
-                                y=[vehicle_type],
-                                x=[fta_mean],
-                                name='FTA Tariff' if not fta_legend_added else None,  # Add legend only once
-                                orientation='h',
-                                width=bar_width,  # Set bar width
-                                offset=bar_width/2,  # Shift to the right for FTA
-                                marker=dict(color='rgba(44, 160, 44, 0.8)'),  # Adjusted opacity for FTA
-                                error_x=dict(
-                                    type='data',
-                                    array=[fta_error],
-                                    arrayminus=[fta_error],
-                                    width=0,
-                                    color='rgba(44, 160, 44, 1)',  # Color of the error bars for FTA
-                                    thickness=36
-                                ),
-                                text=[fta_text],
-                                textposition='outside',
-                                hovertemplate=(
-                                    f"<b>Vehicle Type: {vehicle_type}</b><br>" +
-                                    f"{fta_text}<br>" +
-                                    f"Exceptions/Notes: {fta_exceptions}<br>" +
-                                    f"Reduction Rate: {fta_reduction_rate}%<br>" +
-                                    f"Effective Date (EiF): {fta_eff_date}"
-                                ),
-                                showlegend=not fta_legend_added  # Show legend only once for FTA
-                            ))
-                            fta_legend_added = True  # Mark FTA legend as added
-
-                    # Customize the layout for clarity
-                    fig.update_layout(
-                        barmode='overlay',  # Overlay MFN and FTA bars
-                        
-                        title={
-                                'text': f"Tariff Overview (MFN vs FTA) for {country}",
-                                'x': 0.5,
-                                'xanchor': 'center' ,
-                                'font': {
-                                        'size': 32,
-                                        'family': 'Arial, sans-serif',
-                                        'color': 'black',
-                                        'weight': 'bold'
-                                    }
-                            },
-                        xaxis_title="Tariff (%)",
-                        yaxis_title="Vehicle Type",
-                        legend_title="Tariff Type",
-                        legend={
-                                'x': -0.08,  # Move the legend to the top left corner
-                                'y': 1.15,
-                                'bgcolor': 'rgba(255, 255, 255, 0.8)',  # Add a semi-transparent background to the legend
-                                'bordercolor': 'rgba(200, 200, 200, 0.5)',  # Add a border to the legend
-                                'borderwidth': 1
-                            },
-                        height=800,
-                        width=1200,
-                        bargap=0.4,
-                        template='plotly_white',
-                        
-                        # Transparent background
-                        plot_bgcolor='rgba(255, 255, 255, 0.2)',  # Transparent plot background
-                        paper_bgcolor='rgba(255, 255, 255, 0.5)',  # Transparent overall background
-                        # Center-align the plot and background
-                        margin=dict(l=100, r=100, t=100, b=100),
-                        autosize=False,
-                                
-                        # Customizing the x-axis
-                        xaxis=dict(
-                            tickfont=dict(
-                                size=14,
-                                color='black',
-                                family='Arial, sans-serif',
-                                weight='bold'
-                            ),
-                            title_font=dict(size=16, family='Arial, sans-serif', color='black', weight='bold'),  # Bold x-axis label
-                            showgrid=True,
-                            gridcolor='rgba(200, 200, 200, 0.8)',  # Increase gridline opacity for better visibility
-                            zeroline=True,
-                            zerolinecolor='rgba(200, 200, 200, 0.8)',  # Increase zero-line opacity for better visibility
-                            tickformat='.2f'  # Format x-axis ticks with 2 decimal places
-                        ),
-                        
-                        # Customizing the y-axis
-                        yaxis=dict(
-                            tickfont=dict(
-                                size=14,
-                                color='black',
-                                family='Arial, sans-serif',
-                                weight='bold'
-                            ),
-                            categoryorder='array',
-                            categoryarray=vehicle_order,
-                            title_font=dict(size=16, family='Arial, sans-serif', color='black', weight='bold'),  # Bold y-axis label
-                            showgrid=True,
-                            gridcolor='rgba(200, 200, 200, 0.8)',  # Increase gridline opacity for better visibility
-                            zeroline=True,
-                            zerolinecolor='rgba(200, 200, 200, 0.8)'  # Increase zero-line opacity for better visibility
-                        )
+            # Compact mode draws the whole region as a single heatmap instead of one full-size chart per country
+            # and the phase-down timeline projects the FTA rates over the years from their entry into force
+            render_mode = st.radio("Chart Layout", ["Chart per country", "Compact heatmap", "Phase-down timeline"], horizontal=True, key="region_render_mode_radio")
+
+            if render_mode == "Phase-down timeline":
+                projection = load_projection(excel_file)
+                region_projection = projection[projection['Region'] == selected_sheet]
+                if region_projection.empty:
+                    st.warning(f"No tariffs to project for {selected_sheet}.")
+                else:
+                    first_year, last_year = int(region_projection['Year'].min()), int(region_projection['Year'].max())
+                    year = min(max(datetime.date.today().year, first_year), last_year)
+                    if first_year < last_year:
+                        year = st.slider("Tariff in year", first_year, last_year, year, key="projection_year_slider")
+                    fig = phase_down_figure(region_projection[region_projection['Scheduled']], selected_sheet, year)
+                    with metrics.stage('display'):
+                        st.plotly_chart(fig, use_container_width=True)
+                        st.dataframe(tariff_in_year(region_projection, year), hide_index=True)
+            elif render_mode == "Compact heatmap":
+                fig = load_region_heatmap(summary['tariffs'], selected_sheet)
+                with metrics.stage('display'):
+                    st.plotly_chart(fig, use_container_width=True)
+            else:
+                for country, df in country_dfs.items():
+                    st.markdown(
+                        f"""
+                        <div style="text-align: center; margin-top: 10px;">
+                            <h1 style="font-size: 40px; font-weight: bold; color: #ffffff; text-shadow: 4px 4px 0 #1a237e, 6px 6px 0 rgba(0, 0, 0, 0.5); font-family: 'Arial Black', sans-serif;">{country.upper()}</h1>
+                        </div>
+                        """,
+                        unsafe_allow_html=True
                     )
-                    
 
-                    # Display the Plotly chart in Streamlit
-                    st.plotly_chart(fig, use_container_width=True)
+                    try:
+                        fig = load_tariff_figure(country, df)
+
+                        # Display the Plotly chart in Streamlit
+                        with metrics.stage('display'):
+                            st.plotly_chart(fig, use_container_width=True)
 
                 
-                except Exception as e:
-                    st.warning(f"Error processing data for {country.upper()}: {str(e)}. Skipping this country.")
+                    except Exception as e:
+                        st.warning(f"Error processing data for {country.upper()}: {str(e)}. Skipping this country.")
 
         except Exception as e:
             st.warning(f"Error reading the selected sheet: {e}")
@@ -456,7 +468,7 @@ if selected_view == "General Overview":
         excel_file = os.path.join(fta_data_folder, f"{source_country.lower()}.xlsx")
         if os.path.exists(excel_file):
             try:
-                df = pd.read_excel(excel_file, sheet_name=None)
+                summary = load_summary_tables(excel_file)
                 st.markdown(
                     f"""
                         <div style="text-align: center; margin-top: 10px;">
@@ -467,88 +479,13 @@ if selected_view == "General Overview":
                 )
 
                 # Bar Plot with Error Bars
-                sheet_name, sheet_df = list(df.items())[0]
-                
-                
-                # Convert range values to numeric
-                def convert_range_to_numeric(value):
-                    if isinstance(value, str) and '-' in value:
-                        try:
-                            values = []
-                            for v in value.split('-'):
-                                v_strip = v.strip().upper()
-                                if v_strip == 'NA':
-                                    values.append('NA')
-                                else:
-                                    values.append(round(float(v_strip), 2))
-                            return values
-                        except ValueError:
-                            return ['NA', 'NA']
-                    elif isinstance(value, str) and value.strip().upper() == 'NA':
-                        return ['NA', 'NA']
-                    else:
-                        try:
-                            return [round(float(value), 2), round(float(value), 2)]
-                        except ValueError:
-                            return ['NA', 'NA']
-                
-                sheet_df[['MFN Tariff_Min', 'MFN Tariff_Max']] = sheet_df['MFN Tariff'].apply(convert_range_to_numeric).tolist()
-                sheet_df[['FTA Tariff_Min', 'FTA Tariff_Max']] = sheet_df['FTA Tariff'].apply(convert_range_to_numeric).tolist()
+                # The summary sheet with its range values already converted to numeric
+                sheet_df = summary['overview']
                 
-                # Create the bar plot data
-                bar_plot_data = sheet_df[['Country/Region', 'LC', 'MFN Tariff_Min', 'MFN Tariff_Max', 'FTA Tariff_Min', 'FTA Tariff_Max']]
-                bar_plot_data['MFN Tariff'] = (bar_plot_data['MFN Tariff_Min'] + bar_plot_data['MFN Tariff_Max']) / 2
-                bar_plot_data['FTA Tariff'] = (bar_plot_data['FTA Tariff_Min'] + bar_plot_data['FTA Tariff_Max']) / 2
-
-                # Create the combined plot
-                fig, ax = plt.subplots(figsize=(22, 8), facecolor='None')
-                bar_width = 0.3
-                x = np.arange(len(bar_plot_data['Country/Region']))
-
-                # MFN tariff rate bar plot
-                mfn_bars = ax.bar(x - bar_width/2, bar_plot_data['MFN Tariff'], width=bar_width, color='#4c72b0', alpha=0.6)
-                mfn_error = ax.errorbar(x - bar_width/2, bar_plot_data['MFN Tariff'], yerr=[bar_plot_data['MFN Tariff'] - bar_plot_data['MFN Tariff_Min'], bar_plot_data['MFN Tariff_Max'] - bar_plot_data['MFN Tariff']], fmt='none', capsize=14, elinewidth=31, color='#4c72b0')
-
-                # FTA tariff rate bar plot
-                fta_bars = ax.bar(x + bar_width/2, bar_plot_data['FTA Tariff'], width=bar_width, color='#55a868', alpha=0.6)
-                fta_error = ax.errorbar(x + bar_width/2, bar_plot_data['FTA Tariff'], yerr=[bar_plot_data['FTA Tariff'] - bar_plot_data['FTA Tariff_Min'], bar_plot_data['FTA Tariff_Max'] - bar_plot_data['FTA Tariff']], fmt='none', capsize=14, elinewidth=31, color='#55a868')
-                
-                # Add the MFN and FTA tariff values and LC text to the bars
-                for i, (country_region, lc, mfn_min, mfn_max, fta_min, fta_max) in enumerate(zip(bar_plot_data['Country/Region'], bar_plot_data['LC'], sheet_df['MFN Tariff_Min'], sheet_df['MFN Tariff_Max'], sheet_df['FTA Tariff_Min'], sheet_df['FTA Tariff_Max'])):
-                    print(fta_min)
-                    if mfn_min == 0 and mfn_max == 0:
-                        ax.text(x[i] - bar_width/2, mfn_max + 0.5, "MFN = 0", color='#4c72b0', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
-                    else:
-                        ax.text(x[i] - bar_width/2, mfn_max + 0.5, f"{sheet_df['MFN Tariff'][i]}", color='#4c72b0', fontweight='bold', ha='center', va='bottom', fontsize=12)
-
-                        
-                    if fta_max!=0:
-                        ax.text(x[i] + bar_width/2, fta_min + 0.5, "FTA = Out of Scope", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
-                    elif fta_min == 0 and fta_max == 0:
-                        ax.text(x[i] + bar_width/2, fta_max + 0.5, "FTA = 0", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
-                    else:
-                        ax.text(x[i] + bar_width/2, fta_max + 0.5, f"{sheet_df['FTA Tariff'][i]}", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12)
-                    ax.text(x[i], -0.5, f"\n\nLC {lc}", color='orange', fontweight='bold', ha='center', va='top', fontsize=12, rotation=0)
-                ax.set_xticks(x)
-                ax.set_xticklabels(bar_plot_data['Country/Region'], rotation=0, fontsize=12, fontweight="bold")
-                ax.set_xlabel('\n\nCountry/Region', fontsize=18, color="white", fontweight="bold")
-                ax.set_ylabel('Tariff Rate', fontsize=18, color="white", fontweight="bold")
-                ax.tick_params(axis='both', which='major', labelsize=12)
-
-                # Create the legend
-                mfn_label = 'MFN Tariff'
-                fta_label = 'FTA Tariff'
-                legend_labels = [mfn_label, fta_label,'NA']
-                legend_handles = [mfn_bars, fta_bars]
-
-
-                ax.legend(legend_handles, legend_labels, loc='upper left', fontsize=10)
-                # Make the plot background transparent
-                fig.patch.set_alpha(0.9)
-                ax.patch.set_alpha(0.7)
-
-                # Display the combined plot
-                st.pyplot(fig)
+                # Display the combined plot, rendered once per version of the summary sheet
+                png = load_summary_chart(sheet_df)
+                with metrics.stage('display'):
+                    st.image(png, use_container_width=True)
 
             except Exception as e:
                 st.error(f"Error reading the Excel file: {e}")
@@ -558,10 +495,10 @@ if selected_view == "General Overview":
             if source_country:
                 excel_file = os.path.join(fta_data_folder, f"{source_country.lower()}.xlsx")
                 if os.path.exists(excel_file):
-                    df = pd.read_excel(excel_file, sheet_name=None)
-                    if len(df) > 1:
-                        # Get the FTA Negotiations sheet
-                        fta_negotiations_sheet_name, fta_negotiations_sheet_df = list(df.items())[1]
+                    summary = load_summary_tables(excel_file)
+                    if summary['negotiations'] is not None:
+                        # The FTA Negotiations sheet, prepared once per workbook version
+                        records = load_negotiation_records(excel_file)
 
                         st.markdown(
                             f"""
@@ -572,98 +509,175 @@ if selected_view == "General Overview":
                             unsafe_allow_html=True
                         )
 
-                        # Create the compact expandable sections
-                        col_count = 0
-                        for _, row in fta_negotiations_sheet_df.iterrows():
-                            if col_count % 3 == 0:
-                                cols = st.columns(3)
-                            with cols[col_count % 3]:
-                                expander_title = f"{row['Country/Region']}"
-                                st.markdown(
-                                    f"""
-                                    <div style="background-color: white; color: #4c72b0; padding: 0px; box-shadow: 10px 10px 4px rgba(0, 0, 0, 0.25);border-radius: 50px; text-align: center; font-weight: bold;">
-                                        <h2 style="text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.5); font-size: 20px; font-weight: bold;">{expander_title}</h2>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-    )
-                                with st.expander("", expanded=False):
-                                    st.markdown(
-                                        f"""
-                                        <div style="background-color: #ffffff; color: #000000; padding: 20px; border-radius: 20px; box-shadow: 10px 10px 4px rgba(0, 0, 0, 0.25); margin-bottom: 10px; display: flex; justify-content: center;">
-                                            <table style="width: 100%; font-size: 14px;">
-                                                <tr>
-                                                    <th style="text-align: left;">FTA Name</th>
-                                                    <td style="word-break: break-word;">{row['FTA Name']}</td>
-                                                </tr>
-                                                <tr>
-                                                    <th style="text-align: left;">Negotiation Status</th>
-                                                    <td style="word-break: break-word;">{row['Negotiation Status']}</td>
-                                                </tr>
-                                                <tr>
-                                                    <th style="text-align: left;">Notes</th>
-                                                    <td style="word-break: break-word;">{row['Notes']}</td>
-                                                </tr>
-                                                <tr>
-                                                    <th style="text-align: left;">Last Update</th>
-                                                    <td style="word-break: break-word;">{row['Last Update']}</td>
-                                                </tr>
-                                            </table>
-                                        </div>
-                                        """,
-                                        unsafe_allow_html=True
-                                    )
-                            col_count += 1
+                        # Search, filter and sort on the server and only send one page of negotiations to the browser
+                        layout = st.radio("Negotiations Layout", ["Table", "Cards"], horizontal=True, key="negotiations_layout_radio")
+                        filter_cols = st.columns(3)
+                        search = filter_cols[0].text_input("Search", key="negotiations_search_text_input")
+                        statuses = filter_cols[1].multiselect(
+                            "Negotiation Status", sorted(records['Negotiation Status'].dropna().astype(str).unique()),
+                            key="negotiations_status_multiselect",
+                        )
+                        updated_from = updated_to = None
+                        update_dates = records['_updated'].dropna()
+                        if not update_dates.empty:
+                            updated = filter_cols[2].date_input(
+                                "Last Update", (update_dates.min().date(), update_dates.max().date()), key="negotiations_updated_date_input"
+                            )
+                            # While a range is being picked only its start is set
+                            if len(updated) == 2:
+                                updated_from, updated_to = updated
+
+                        display_columns = [column for column in records.columns if not str(column).startswith('_') and column != 'Export Country']
+                        sort_cols = st.columns(3)
+                        sort_by = sort_cols[0].selectbox("Sort by", display_columns, key="negotiations_sort_selectbox")
+                        descending = sort_cols[1].toggle("Descending", key="negotiations_descending_toggle")
+                        page_size = sort_cols[2].selectbox("Per page", NEGOTIATION_PAGE_SIZES, key="negotiations_page_size_selectbox")
+
+                        rows = filter_negotiations(records, search, statuses, updated_from, updated_to)
+                        rows = sort_negotiations(rows, sort_by, descending)
+                        page_count = max(1, math.ceil(len(rows) / page_size))
+                        # Keyed by the page count, so narrowing the filters starts again from the first page
+                        page = st.number_input("Page", 1, page_count, 1, key=f"negotiations_page_number_input_{page_count}")
+                        page_rows = rows.iloc[(page - 1) * page_size:page * page_size]
+                        st.caption(f"{len(rows)} of {len(records)} negotiations, page {page} of {page_count}")
+
+                        if layout == "Table":
+                            with metrics.stage('display'):
+                                st.dataframe(page_rows[display_columns], hide_index=True, use_container_width=True)
+                        else:
+                            # Create the compact expandable sections
+                            for col_count, (card_title, card_body) in enumerate(zip(page_rows['_card_title'], page_rows['_card_body'])):
+                                if col_count % 3 == 0:
+                                    cols = st.columns(3)
+                                with cols[col_count % 3]:
+                                    st.markdown(card_title, unsafe_allow_html=True)
+                                    with st.expander("", expanded=False):
+                                        st.markdown(card_body, unsafe_allow_html=True)
                     else:
                         st.warning("No FTA negotiation data found in the selected Excel file.")
         
     else:
         st.markdown(f"PLEASE SELECT EXPORT COUNTRY")
 
+elif selected_view == "SQL Query":
+    st.markdown("## SQL Query")
+    sql = st.text_area(
+        "SQL",
+        'SELECT "Import Country", "Vehicle Type", min("Tariff Max.") AS "Lowest FTA Tariff"\n'
+        'FROM tariffs\nWHERE "Tariff Type" = \'FTA\'\nGROUP BY ALL\nORDER BY 1, 2',
+        height=200,
+        key="sql_query_text_area",
+    )
+    if st.button("Run Query", key="sql_query_button"):
+        try:
+            result = query(load_lake_tables(fta_data_folder), sql)
+            if result is None:
+                st.success("Done.")
+            else:
+                with metrics.stage('display'):
+                    st.dataframe(result, hide_index=True)
+        except Exception as e:
+            st.error(f"Error running the query: {e}")
+
 elif selected_view == "Country Specific" and selected_import_country:
 
     try:
-        # Initialize an empty list to store dataframes
-        country_specific_dfs = []
-
-        # Iterate through all the Excel files
-        for excel_file in excel_files:
-            file_path = os.path.join(fta_data_folder, f"{excel_file.lower()}.xlsx")
-            if os.path.exists(file_path):
-                df = pd.read_excel(file_path, sheet_name=None)
-                
-                # Iterate through all the sheets (except the first 2)
-                for sheet_name in list(df.keys())[2:]:
-                    sheet_df = df[sheet_name]
-                    
-                    # Check if the selected import country is present in the sheet
-                    if 'Country/Region' in sheet_df.columns:
-                        # Locate the first row for the selected import country
-                        start_idx = sheet_df[sheet_df['Country/Region'] == selected_import_country].index
-
-                        if not start_idx.empty:
-                            # Get the first index of the selected country
-                            start_idx = start_idx[0]
-
-                            # Iterate through rows from start_idx onwards
-                            for idx in range(start_idx, len(sheet_df)):
-                                # Stop if another valid country appears
-                                if pd.notnull(sheet_df.loc[idx, 'Country/Region']) and sheet_df.loc[idx, 'Country/Region'] != selected_import_country:
-                                    break
-                                # Append the rows for the selected import country
-                                country_specific_dfs.append(sheet_df.iloc[idx])
-
-        # Convert the list of rows into a DataFrame
-        if country_specific_dfs:
-            combined_df = pd.DataFrame(country_specific_dfs)
-            st.dataframe(combined_df)  # Display the combined DataFrame
+        # Look up where the selected import country appears instead of scanning every workbook
+        import_index, locations = load_import_index(fta_data_folder)
+        for file_name, error in import_index['errors'].items():
+            st.warning(f"Skipping {file_name}, it could not be read: {error}")
+        blocks = locations.get(selected_import_country, [])
+
+        if blocks:
+            # The row blocks are read in background threads and the table is redrawn as they arrive,
+            # at most every REDRAW_INTERVAL seconds so wide queries don't spend their time re-rendering
+            progress = st.progress(0.0, text=f"Loading {len(blocks)} sheets...")
+            table = st.empty()
+            frames = [None] * len(blocks)
+
+            def show_rows():
+                combined = pd.concat([frame for frame in frames if frame is not None])
+                with metrics.stage('display'):
+                    table.dataframe(combined)  # Display the combined DataFrame
+                return combined
+
+            done = 0
+            pending = False
+            last_redraw = 0.0
+            for position, count, rows, error in iter_import_country_rows(
+                fta_data_folder, import_index, locations, selected_import_country, read_rows=load_country_rows
+            ):
+                done += 1
+                if error is not None:
+                    file_name, _, sheet_name, _, _ = blocks[position]
+                    st.warning(f"Skipping {sheet_name} of {file_name}, it could not be read: {error}")
+                else:
+                    frames[position] = rows
+                    pending = True
+                if pending and time.perf_counter() - last_redraw >= REDRAW_INTERVAL:
+                    combined = show_rows()
+                    pending = False
+                    last_redraw = time.perf_counter()
+                progress.progress(done / count, text=f"Loaded {done} of {count} sheets")
+            progress.empty()
+
+            if all(frame is None for frame in frames):
+                st.warning(f"No data found for {selected_import_country}.")
+            else:
+                if pending:
+                    combined = show_rows()
+                # The last drawn table is what gets exported, rather than concatenating the blocks a second time
+                with st.expander(f"Download {selected_import_country}"):
+                    download_controls([(selected_import_country, combined)], selected_import_country, "country")
         else:
             st.warning(f"No data found for {selected_import_country}.")
 
+        # Which export country reaches the selected market with the lowest tariff, per vehicle type
+        options = sourcing_options(load_sourcing_ranking(fta_data_folder), [selected_import_country])
+        if not options.empty:
+            st.markdown(
+                f"""
+                <div style="text-align: left; margin-top: 10px;">
+                    <h1 style="font-size: 40px; font-weight: bold; color: white; text-shadow: 4px 4px 0 #1a237e, 6px 6px 0 rgba(0, 0, 0, 0.5); font-family: 'Arial Black', sans-serif;">Best sourcing into {selected_import_country}</h1>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+            fig = sourcing_figure(options, selected_import_country)
+            with metrics.stage('display'):
+                st.dataframe(options, hide_index=True)
+                st.plotly_chart(fig, use_container_width=True)
+
     except Exception as e:
         st.error(f"Error processing data for {selected_import_country}: {e}")
 
 
 
 else:
-    st.markdown(f"PLEASE SELECT SPECIFIC COUNTRY")
\ No newline at end of file
+    st.markdown(f"PLEASE SELECT SPECIFIC COUNTRY")
+
+
+metrics.record('rerun', time.perf_counter() - rerun_start)
+
+# Hot-path timings and cache hit rates of this process, opened by adding ?debug=1 to the URL
+if st.query_params.get("debug") == "1":
+    snapshot = metrics.snapshot()
+    with st.sidebar.expander("Performance", expanded=True):
+        stages = pd.DataFrame.from_dict(snapshot['stages'], orient='index')
+        if not stages.empty:
+            stages['mean_ms'] = stages['seconds'] / stages['count'] * 1000
+            stages['max_ms'] = stages['max_seconds'] * 1000
+            stages['peak_mb'] = pd.to_numeric(stages['peak_bytes']) / 2**20
+            st.dataframe(stages[['count', 'mean_ms', 'max_ms', 'peak_mb']].round(2))
+        caches = pd.DataFrame.from_dict(snapshot['caches'], orient='index')
+        if not caches.empty:
+            caches['hit_rate'] = caches['hits'] / (caches['hits'] + caches['misses'])
+            st.dataframe(caches.round(2))
+        st.caption("Peak memory is only traced with FTA_TRACE_MEMORY=1.")
+
+# Prometheus textfile for scraping, rewritten after every rerun
+if os.environ.get('FTA_METRICS_FILE'):
+    try:
+        metrics.write_prometheus(os.environ['FTA_METRICS_FILE'])
+    except OSError:
+        pass
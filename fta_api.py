@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from fta_data import (
+    FTA_DATA_FOLDER, TARIFF_SCHEMA, import_country_table, import_locations, read_country_rows, read_summary_tables,
+    region_country_tables, update_import_index, widen_float32, workbook_path,
+)
+from fta_export import EXPORT_FORMATS, iter_csv, write_export
+from fta_metrics import metrics
+from fta_sourcing import lake_tariffs, rank_sourcing, sourcing_options
+from fta_watch import WorkbookCatalog
+
+
+# Headless JSON access to the FTA lookups for other internal tools, backed by the same compiled
+# tables, sidecars, import index and workbook catalog as the Streamlit app:
+#   python fta_api.py [--folder FTA_data] [--host 127.0.0.1] [--port 8000] [--max-concurrency 8]
+#
+#   GET /exports                                 export countries
+#   GET /exports/{country}/regions               region sheets of an export country
+#   GET /exports/{country}/regions/{region}      per-import-country tariff tables of a region
+#   GET /exports/{country}/regions/{region}/download?format=csv|parquet|xlsx
+#   GET /exports/{country}/negotiations          FTAs under negotiation
+#   GET /imports/{country}                       rows of an import country across all export countries
+#   GET /imports/{country}/download?format=csv|parquet|xlsx
+#   GET /imports/{country}/sourcing              export countries ranked by landed tariff (?vehicle=BEV&top=3)
+#   GET /metrics                                 stage timings and cache hit rates in the Prometheus text format
+
+# Maximum number of parsed summaries kept in memory (least recently used are evicted first)
+SUMMARY_CACHE_ENTRIES = 32
+
+MAX_CONCURRENT_REQUESTS = 8
+
+# Seconds a request may wait for a free slot before it is turned away with 503
+QUEUE_TIMEOUT = 5.0
+
+
+@functools.lru_cache(maxsize=SUMMARY_CACHE_ENTRIES)
+def _summary_tables(excel_file, mtime_ns, size):
+    metrics.cache_miss('summary_tables')
+    return read_summary_tables(excel_file)
+
+
+def summary_tables(excel_file):
+    metrics.cache_lookup('summary_tables')
+    stat = os.stat(excel_file)
+    return _summary_tables(excel_file, stat.st_mtime_ns, stat.st_size)
+
+
+# lru_cache doesn't stop concurrent requests from all computing the same missing value, and the index and the ranking
+# cover the whole lake, so only one thread at a time computes or looks them up
+_import_index_lock = threading.Lock()
+_sourcing_ranking_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _import_index(folder, catalog_version):
+    metrics.cache_miss('import_index')
+    index = update_import_index(folder, processes=True)
+    return index, import_locations(index)
+
+
+def import_index(folder, catalog_version):
+    metrics.cache_lookup('import_index')
+    with _import_index_lock:
+        return _import_index(folder, catalog_version)
+
+
+@functools.lru_cache(maxsize=256)
+def _country_rows(excel_file, sheet_name, start, stop, sha256):
+    metrics.cache_miss('country_rows')
+    return read_country_rows(excel_file, sheet_name, start, stop, sha256)
+
+
+def country_rows(excel_file, sheet_name, start, stop, sha256):
+    metrics.cache_lookup('country_rows')
+    return _country_rows(excel_file, sheet_name, start, stop, sha256)
+
+
+@functools.lru_cache(maxsize=2)
+def _sourcing_ranking(folder, catalog_version):
+    return rank_sourcing(lake_tariffs(folder, read_tables=summary_tables))
+
+
+def sourcing_ranking(folder, catalog_version):
+    with _sourcing_ranking_lock:
+        return _sourcing_ranking(folder, catalog_version)
+
+
+def _records(frame):
+    # NaN becomes null, dates ISO strings and float32 rates their rounded float64 values
+    return json.loads(widen_float32(frame).to_json(orient='records', date_format='iso', default_handler=str))
+
+
+def _not_found(detail):
+    return JSONResponse({'detail': detail}, status_code=404)
+
+
+def _download(sheets, export_format, file_name, sheet_column=None, schema=None):
+    # CSV is streamed chunk by chunk as it is written; Parquet and Excel need a seekable file, so they are written to a
+    # temporary file that is removed once it has been sent
+    headers = {'Content-Disposition': f'attachment; filename="{file_name}.{export_format}"'}
+    if export_format == 'csv':
+        return StreamingResponse(iter_csv(sheets, sheet_column), media_type=EXPORT_FORMATS['csv'], headers=headers)
+    descriptor, path = tempfile.mkstemp(suffix=f".{export_format}")
+    os.close(descriptor)
+    try:
+        write_export(sheets, export_format, path, sheet_column, schema)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(path, media_type=EXPORT_FORMATS[export_format], headers=headers, background=BackgroundTask(os.remove, path))
+
+
+def _export_format(request):
+    export_format = request.query_params.get('format', 'csv')
+    return export_format if export_format in EXPORT_FORMATS else None
+
+
+def _bad_format():
+    return JSONResponse({'detail': f"format must be one of {', '.join(EXPORT_FORMATS)}."}, status_code=422)
+
+
+def create_app(folder=FTA_DATA_FOLDER, max_concurrency=MAX_CONCURRENT_REQUESTS, catalog=None):
+    catalog = catalog or WorkbookCatalog(folder)
+    slots = asyncio.Semaphore(max_concurrency)
+
+    def export_workbook(country):
+        excel_file = workbook_path(country, folder)
+        return excel_file if os.path.exists(excel_file) else None
+
+    def exports(request):
+        return JSONResponse(catalog.export_countries())
+
+    def regions(request):
+        excel_file = export_workbook(request.path_params['country'])
+        if excel_file is None:
+            return _not_found(f"No Excel file found for {request.path_params['country'].upper()}.")
+        return JSONResponse(summary_tables(excel_file)['regions'])
+
+    def region(request):
+        excel_file = export_workbook(request.path_params['country'])
+        if excel_file is None:
+            return _not_found(f"No Excel file found for {request.path_params['country'].upper()}.")
+        summary = summary_tables(excel_file)
+        sheet = request.path_params['region']
+        if sheet not in summary['regions']:
+            return _not_found(f"No region {sheet} for {request.path_params['country'].upper()}.")
+        if sheet in summary['region_errors']:
+            return JSONResponse({'detail': summary['region_errors'][sheet]}, status_code=422)
+        issues = summary['tariff_issues']
+        return JSONResponse({
+            'lc': summary['region_lc'].get(sheet),
+            'issues': _records(issues[issues['Region'] == sheet]),
+            'countries': {
+                str(country): _records(df) for country, df in region_country_tables(summary['tariffs'], sheet).items()
+            },
+        })
+
+    def region_download(request):
+        export_format = _export_format(request)
+        if export_format is None:
+            return _bad_format()
+        excel_file = export_workbook(request.path_params['country'])
+        if excel_file is None:
+            return _not_found(f"No Excel file found for {request.path_params['country'].upper()}.")
+        summary = summary_tables(excel_file)
+        sheet = request.path_params['region']
+        if sheet not in summary['regions']:
+            return _not_found(f"No region {sheet} for {request.path_params['country'].upper()}.")
+        if sheet in summary['region_errors']:
+            return JSONResponse({'detail': summary['region_errors'][sheet]}, status_code=422)
+        return _download(
+            region_country_tables(summary['tariffs'], sheet).items(), export_format,
+            f"{request.path_params['country'].upper()}_{sheet}", sheet_column='Import Country', schema=TARIFF_SCHEMA,
+        )
+
+    def negotiations(request):
+        excel_file = export_workbook(request.path_params['country'])
+        if excel_file is None:
+            return _not_found(f"No Excel file found for {request.path_params['country'].upper()}.")
+        sheet_df = summary_tables(excel_file)['negotiations']
+        return JSONResponse([] if sheet_df is None else _records(sheet_df))
+
+    def imports(request):
+        index, locations = import_index(folder, catalog.version)
+        rows = import_country_table(folder, index, locations, request.path_params['country'], read_rows=country_rows)
+        return JSONResponse({'rows': [] if rows is None else _records(rows), 'skipped': index['errors']})
+
+    def imports_download(request):
+        export_format = _export_format(request)
+        if export_format is None:
+            return _bad_format()
+        index, locations = import_index(folder, catalog.version)
+        rows = import_country_table(folder, index, locations, request.path_params['country'], read_rows=country_rows)
+        if rows is None:
+            return _not_found(f"No data found for {request.path_params['country']}.")
+        return _download([(request.path_params['country'], rows)], export_format, request.path_params['country'])
+
+    def sourcing(request):
+        vehicle_types = request.query_params.getlist('vehicle') or None
+        top = request.query_params.get('top')
+        if top is not None and not top.isdigit():
+            return JSONResponse({'detail': "top must be a positive integer."}, status_code=422)
+        ranking = sourcing_ranking(folder, catalog.version)
+        options = sourcing_options(ranking, [request.path_params['country']], vehicle_types, None if top is None else int(top))
+        return JSONResponse(_records(options))
+
+    async def prometheus(request):
+        # Served outside the concurrency limit so scrapes still answer under load
+        return PlainTextResponse(metrics.prometheus(), media_type='text/plain; version=0.0.4')
+
+    def limited(handler):
+        # Handlers run in the thread pool so pandas work never blocks the event loop; at most
+        # max_concurrency of them run at once and requests that can't get a slot in time get a 503
+        async def endpoint(request):
+            try:
+                await asyncio.wait_for(slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return JSONResponse({'detail': "Too many concurrent requests."}, status_code=503, headers={'Retry-After': '1'})
+            try:
+                return await run_in_threadpool(handler, request)
+            finally:
+                slots.release()
+        return endpoint
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        catalog.start()
+        yield
+        catalog.stop()
+
+    return Starlette(
+        routes=[
+            Route('/exports', limited(exports)),
+            Route('/exports/{country}/regions', limited(regions)),
+            Route('/exports/{country}/regions/{region}', limited(region)),
+            Route('/exports/{country}/regions/{region}/download', limited(region_download)),
+            Route('/exports/{country}/negotiations', limited(negotiations)),
+            Route('/imports/{country}', limited(imports)),
+            Route('/imports/{country}/download', limited(imports_download)),
+            Route('/imports/{country}/sourcing', limited(sourcing)),
+            Route('/metrics', prometheus),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the FTA lookups as JSON over HTTP.")
+    parser.add_argument('--folder', default=FTA_DATA_FOLDER, help="folder containing the FTA workbooks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENT_REQUESTS, help="requests processed at once")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(create_app(args.folder, args.max_concurrency), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+from concurrent.futures import as_completed
+
+from fta_charts import prune_figures, warm_figures
+from fta_data import (
+    FTA_DATA_FOLDER, file_sha256, import_locations, list_workbooks, process_pool, read_sidecar_manifest,
+    read_summary_tables_manifest, update_import_index, write_sidecar, write_summary_tables,
+)
+from fta_export import EXPORT_FORMATS, export_lake
+
+
+# Offline ingestion for the FTA data lake, run it whenever the data team drops new workbooks:
+#   python fta_build.py sidecars [--folder FTA_data] [--force] [--jobs N]
+#   python fta_build.py index [--folder FTA_data] [--jobs N]
+#   python fta_build.py tables [--folder FTA_data] [--force] [--jobs N]
+#   python fta_build.py figures [--folder FTA_data] [--jobs N]
+#   python fta_build.py export [--folder FTA_data] [--format csv|parquet|xlsx] [--output PATH]
+
+
+def _stale_workbooks(folder, read_manifest, force):
+    # (excel_file, sha256) of every workbook whose compiled output is missing or out of date
+    stale = []
+    for excel_file in list_workbooks(folder):
+        sha256 = file_sha256(excel_file)
+        manifest = read_manifest(excel_file)
+        if not force and manifest is not None and manifest['sha256'] == sha256:
+            print(f"{os.path.basename(excel_file)}: up to date")
+        else:
+            stale.append((excel_file, sha256))
+    return stale
+
+
+def _compile_in_parallel(stale, compile_workbook, jobs):
+    # Workbooks are independent, so they are compiled in a process pool; a failure is reported and the rest continue
+    with process_pool(jobs) as pool:
+        futures = {pool.submit(compile_workbook, excel_file, sha256=sha256): excel_file for excel_file, sha256 in stale}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                print(f"{os.path.basename(futures[future])}: failed: {e}")
+
+
+def build_sidecars(folder, force=False, jobs=None):
+    stale = _stale_workbooks(folder, read_sidecar_manifest, force)
+    for excel_file, manifest in _compile_in_parallel(stale, write_sidecar, jobs):
+        print(f"{os.path.basename(excel_file)}: wrote {len(manifest['sheets'])} sheets")
+
+
+def build_import_index(folder, jobs=None):
+    index = update_import_index(folder, max_workers=jobs, processes=True)
+    for name, error in index['errors'].items():
+        print(f"{name}: failed: {error}")
+    print(f"indexed {len(import_locations(index))} import countries across {len(index['workbooks'])} workbooks")
+
+
+def build_summary_tables(folder, force=False, jobs=None):
+    stale = _stale_workbooks(folder, read_summary_tables_manifest, force)
+    for excel_file, manifest in _compile_in_parallel(stale, write_summary_tables, jobs):
+        print(
+            f"{os.path.basename(excel_file)}: wrote tables for {len(manifest['regions'])} regions, "
+            f"{manifest['issue_count']} malformed cells"
+        )
+
+
+def build_figures(folder, jobs=None):
+    # Every combination is checked, figures already in the cache are only read back
+    excel_files = list_workbooks(folder)
+    keep = set()
+    warmed = 0
+    for excel_file, result in _compile_in_parallel([(f, None) for f in excel_files], warm_figures, jobs):
+        keep.update(result['figures'])
+        warmed += 1
+        print(f"{os.path.basename(excel_file)}: {len(result['figures'])} figures across {len(result['regions'])} regions")
+
+    # Only prune after a complete run, otherwise a workbook that failed would lose its figures
+    if warmed == len(excel_files):
+        print(f"pruned {prune_figures(folder, keep)} stale figures")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the FTA_data workbooks into fast-loading caches.")
+    parser.add_argument('--folder', default=FTA_DATA_FOLDER, help="folder containing the FTA workbooks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sidecars = commands.add_parser('sidecars', help="write a columnar (Feather) copy of every sheet")
+    sidecars.add_argument('--force', action='store_true', help="rebuild even when the content hash still matches")
+    sidecars.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+
+    index = commands.add_parser('index', help="update the import-country index used by the Country Specific view")
+    index.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+
+    tables = commands.add_parser('tables', help="compile the normalized tariff, overview and negotiation tables")
+    tables.add_argument('--force', action='store_true', help="rebuild even when the content hash still matches")
+    tables.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+
+    figures = commands.add_parser('figures', help="pre-render the region chart of every export, region and import country")
+    figures.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+
+    export = commands.add_parser('export', help="write the tariff tables of every export country to one file")
+    export.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    export.add_argument('--output', default=None, help="file to write (default: the exports folder of the cache)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'sidecars':
+        build_sidecars(args.folder, force=args.force, jobs=args.jobs)
+    elif args.command == 'index':
+        build_import_index(args.folder, jobs=args.jobs)
+    elif args.command == 'tables':
+        build_summary_tables(args.folder, force=args.force, jobs=args.jobs)
+    elif args.command == 'figures':
+        build_figures(args.folder, jobs=args.jobs)
+    elif args.command == 'export':
+        print(f"wrote {export_lake(args.folder, args.format, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,523 @@
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from fta_data import (
+    VEHICLE_ORDER, cache_folder, file_sha256, read_summary_tables, region_country_tables, widen_float32,
+)
+from fta_metrics import metrics
+
+
+# Figure builders shared by the Streamlit app, the cache warmers and the benchmarks.
+# Plotting libraries are imported inside the builders so importing this module stays cheap.
+
+# Bump whenever a figure builder changes, so cached figures from older code are never served
+FIGURE_VERSION = 3
+
+
+@metrics.timed('figure_build')
+def tariff_overview_figure(country, df):
+    # Horizontal MFN vs FTA bars per vehicle type for one import country of a region sheet
+    import plotly.graph_objects as go
+
+    # The columns arrive typed by fta_data.TARIFF_SCHEMA (float32 rates, ordered vehicle/tariff type categoricals, dates),
+    # so missing values only need their display defaults, filled for all rows at once
+    vehicle_order = VEHICLE_ORDER
+    df = widen_float32(df)
+    filtered_data = df.assign(**{
+        'Tariff Min.': df['Tariff Min.'].fillna(0),
+        'Tariff Max.': df['Tariff Max.'].fillna(0),
+        'Exceptions/Notes': df['Exceptions/Notes'].fillna('None'),
+        'Reduction Rate%': df['Reduction Rate%'].map('{:g}'.format, na_action='ignore').fillna('N/A'),
+        'EiF': df['EiF'].dt.strftime('%Y-%m-%d').fillna('N/A'),
+    }).sort_values('Vehicle Type')
+
+    # Prepare the Plotly figure
+    fig = go.Figure()
+
+    # Define the width of the bars
+    bar_width = 0.3  # Width of each bar
+
+    # Flags to add legend entries once
+    mfn_legend_added = False
+    fta_legend_added = False
+
+
+
+    # Loop through the vehicle types
+    for vehicle_type in vehicle_order:
+        vehicle_data = filtered_data[filtered_data['Vehicle Type'] == vehicle_type]
+
+        # Calculate MFN tariffs
+        mfn_row = vehicle_data[vehicle_data['Tariff Type'] == 'MFN']
+        if not mfn_row.empty:
+            mfn_min = mfn_row['Tariff Min.'].values[0]
+            mfn_max = mfn_row['Tariff Max.'].values[0]
+            mfn_exceptions = mfn_row['Exceptions/Notes'].values[0]
+            mfn_reduction_rate = mfn_row['Reduction Rate%'].values[0]
+            mfn_eff_date = mfn_row['EiF'].values[0]
+
+            if mfn_min == 0 and mfn_max == 0:
+                mfn_mean = 0
+                mfn_error = 0
+                mfn_text = "<b><span style='color:blue;font-size:16px'>MFN = 0</span></b>"
+            else:
+                mfn_mean = (mfn_min + mfn_max) / 2  # Calculate the mean
+                mfn_error = (mfn_max - mfn_min) / 2  # Error is half the range
+                mfn_text = f"MFN: {mfn_min} - {mfn_max}"
+
+            fig.add_trace(go.Bar(
+                y=[vehicle_type],
+                x=[mfn_mean],
+                name='MFN Tariff' if not mfn_legend_added else None,  # Add legend only once
+                orientation='h',
+                width=bar_width,  # Set bar width
+                offset=-bar_width/2,  # Shift to the left for MFN
+                marker=dict(color='rgba(31, 119, 180, 0.5)'),  # Adjusted opacity for MFN
+                error_x=dict(
+                    type='data',
+                    array=[mfn_error],
+                    arrayminus=[mfn_error],
+                    width=0,
+                    color='rgba(31, 119, 180, 1)',  # Color of the error bars for MFN
+                    thickness=36
+                ),
+                text=[mfn_text],
+                textposition='outside',
+                hovertemplate=(
+                    f"<b>Vehicle Type: {vehicle_type}</b><br>" +
+                    f"{mfn_text}<br>" +
+                    f"Exceptions/Notes: {mfn_exceptions}<br>" +
+                    f"Reduction Rate: {mfn_reduction_rate}%<br>" +
+                    f"Effective Date (EiF): {mfn_eff_date}"
+                ),
+                showlegend=not mfn_legend_added  # Show legend only once for MFN
+            ))
+            mfn_legend_added = True  # Mark MFN legend as added
+
+        # Calculate FTA tariffs
+        fta_row = vehicle_data[vehicle_data['Tariff Type'] == 'FTA']
+        if not fta_row.empty:
+            fta_min = fta_row['Tariff Min.'].values[0]
+            fta_max = fta_row['Tariff Max.'].values[0]
+            fta_exceptions = fta_row['Exceptions/Notes'].values[0]
+            fta_reduction_rate = fta_row['Reduction Rate%'].values[0]
+            fta_eff_date = fta_row['EiF'].values[0]
+
+            if fta_min == 0 and fta_max == 0:
+                fta_mean = 0
+                fta_error = 0
+                fta_text = "<b><span style='color:green;font-size:16px'>FTA = 0</span></b>"
+            elif fta_max == 0:
+                fta_mean = fta_min
+                fta_error = 0
+                fta_text = "<b><span style='color:orange;font-size:16px'>FTA = Out of Scope</span></b>"
+            else:
+                fta_mean = fta_max  # Using max for FTA
+                fta_error = (fta_max - fta_min) / 2  # Error is half the range
+                fta_text = f"FTA: {fta_min} - {fta_max}"
+
+            fig.add_trace(go.Bar(
+                y=[vehicle_type],
+                x=[fta_mean],
+                name='FTA Tariff' if not fta_legend_added else None,  # Add legend only once
+                orientation='h',
+                width=bar_width,  # Set bar width
+                offset=bar_width/2,  # Shift to the right for FTA
+                marker=dict(color='rgba(44, 160, 44, 0.8)'),  # Adjusted opacity for FTA
+                error_x=dict(
+                    type='data',
+                    array=[fta_error],
+                    arrayminus=[fta_error],
+                    width=0,
+                    color='rgba(44, 160, 44, 1)',  # Color of the error bars for FTA
+                    thickness=36
+                ),
+                text=[fta_text],
+                textposition='outside',
+                hovertemplate=(
+                    f"<b>Vehicle Type: {vehicle_type}</b><br>" +
+                    f"{fta_text}<br>" +
+                    f"Exceptions/Notes: {fta_exceptions}<br>" +
+                    f"Reduction Rate: {fta_reduction_rate}%<br>" +
+                    f"Effective Date (EiF): {fta_eff_date}"
+                ),
+                showlegend=not fta_legend_added  # Show legend only once for FTA
+            ))
+            fta_legend_added = True  # Mark FTA legend as added
+
+    # Customize the layout for clarity
+    fig.update_layout(
+        barmode='overlay',  # Overlay MFN and FTA bars
+
+        title={
+                'text': f"Tariff Overview (MFN vs FTA) for {country}",
+                'x': 0.5,
+                'xanchor': 'center' ,
+                'font': {
+                        'size': 32,
+                        'family': 'Arial, sans-serif',
+                        'color': 'black',
+                        'weight': 'bold'
+                    }
+            },
+        xaxis_title="Tariff (%)",
+        yaxis_title="Vehicle Type",
+        legend_title="Tariff Type",
+        legend={
+                'x': -0.08,  # Move the legend to the top left corner
+                'y': 1.15,
+                'bgcolor': 'rgba(255, 255, 255, 0.8)',  # Add a semi-transparent background to the legend
+                'bordercolor': 'rgba(200, 200, 200, 0.5)',  # Add a border to the legend
+                'borderwidth': 1
+            },
+        height=800,
+        width=1200,
+        bargap=0.4,
+        template='plotly_white',
+
+        # Transparent background
+        plot_bgcolor='rgba(255, 255, 255, 0.2)',  # Transparent plot background
+        paper_bgcolor='rgba(255, 255, 255, 0.5)',  # Transparent overall background
+        # Center-align the plot and background
+        margin=dict(l=100, r=100, t=100, b=100),
+        autosize=False,
+
+        # Customizing the x-axis
+        xaxis=dict(
+            tickfont=dict(
+                size=14,
+                color='black',
+                family='Arial, sans-serif',
+                weight='bold'
+            ),
+            title_font=dict(size=16, family='Arial, sans-serif', color='black', weight='bold'),  # Bold x-axis label
+            showgrid=True,
+            gridcolor='rgba(200, 200, 200, 0.8)',  # Increase gridline opacity for better visibility
+            zeroline=True,
+            zerolinecolor='rgba(200, 200, 200, 0.8)',  # Increase zero-line opacity for better visibility
+            tickformat='.2f'  # Format x-axis ticks with 2 decimal places
+        ),
+
+        # Customizing the y-axis
+        yaxis=dict(
+            tickfont=dict(
+                size=14,
+                color='black',
+                family='Arial, sans-serif',
+                weight='bold'
+            ),
+            categoryorder='array',
+            categoryarray=vehicle_order,
+            title_font=dict(size=16, family='Arial, sans-serif', color='black', weight='bold'),  # Bold y-axis label
+            showgrid=True,
+            gridcolor='rgba(200, 200, 200, 0.8)',  # Increase gridline opacity for better visibility
+            zeroline=True,
+            zerolinecolor='rgba(200, 200, 200, 0.8)'  # Increase zero-line opacity for better visibility
+        )
+    )
+
+    return fig
+
+
+@metrics.timed('figure_build')
+def summary_chart_figure(sheet_df):
+    # "EXPORTS TO" bar chart with error bars over the summary sheet of an export country.
+    # A bare Figure is not tracked by pyplot's global registry, so it is freed as soon as it is dropped.
+    from matplotlib.figure import Figure
+
+    # Create the bar plot data
+    bar_plot_data = sheet_df[['Country/Region', 'LC', 'MFN Tariff_Min', 'MFN Tariff_Max', 'FTA Tariff_Min', 'FTA Tariff_Max', 'MFN Tariff_Mean', 'FTA Tariff_Mean']]
+    bar_plot_data = bar_plot_data.rename(columns={'MFN Tariff_Mean': 'MFN Tariff', 'FTA Tariff_Mean': 'FTA Tariff'})
+
+    # Create the combined plot
+    fig = Figure(figsize=(22, 8), facecolor='None')
+    ax = fig.subplots()
+    bar_width = 0.3
+    x = np.arange(len(bar_plot_data['Country/Region']))
+
+    # MFN tariff rate bar plot
+    mfn_bars = ax.bar(x - bar_width/2, bar_plot_data['MFN Tariff'], width=bar_width, color='#4c72b0', alpha=0.6)
+    mfn_error = ax.errorbar(x - bar_width/2, bar_plot_data['MFN Tariff'], yerr=[bar_plot_data['MFN Tariff'] - bar_plot_data['MFN Tariff_Min'], bar_plot_data['MFN Tariff_Max'] - bar_plot_data['MFN Tariff']], fmt='none', capsize=14, elinewidth=31, color='#4c72b0')
+
+    # FTA tariff rate bar plot
+    fta_bars = ax.bar(x + bar_width/2, bar_plot_data['FTA Tariff'], width=bar_width, color='#55a868', alpha=0.6)
+    fta_error = ax.errorbar(x + bar_width/2, bar_plot_data['FTA Tariff'], yerr=[bar_plot_data['FTA Tariff'] - bar_plot_data['FTA Tariff_Min'], bar_plot_data['FTA Tariff_Max'] - bar_plot_data['FTA Tariff']], fmt='none', capsize=14, elinewidth=31, color='#55a868')
+
+    # Add the MFN and FTA tariff values and LC text to the bars
+    for i, (country_region, lc, mfn_min, mfn_max, fta_min, fta_max) in enumerate(zip(bar_plot_data['Country/Region'], bar_plot_data['LC'], sheet_df['MFN Tariff_Min'], sheet_df['MFN Tariff_Max'], sheet_df['FTA Tariff_Min'], sheet_df['FTA Tariff_Max'])):
+        if mfn_min == 0 and mfn_max == 0:
+            ax.text(x[i] - bar_width/2, mfn_max + 0.5, "MFN = 0", color='#4c72b0', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
+        else:
+            ax.text(x[i] - bar_width/2, mfn_max + 0.5, f"{sheet_df['MFN Tariff'][i]}", color='#4c72b0', fontweight='bold', ha='center', va='bottom', fontsize=12)
+
+
+        if fta_max!=0:
+            ax.text(x[i] + bar_width/2, fta_min + 0.5, "FTA = Out of Scope", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
+        elif fta_min == 0 and fta_max == 0:
+            ax.text(x[i] + bar_width/2, fta_max + 0.5, "FTA = 0", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12, rotation=90)
+        else:
+            ax.text(x[i] + bar_width/2, fta_max + 0.5, f"{sheet_df['FTA Tariff'][i]}", color='green', fontweight='bold', ha='center', va='bottom', fontsize=12)
+        ax.text(x[i], -0.5, f"\n\nLC {lc}", color='orange', fontweight='bold', ha='center', va='top', fontsize=12, rotation=0)
+    ax.set_xticks(x)
+    ax.set_xticklabels(bar_plot_data['Country/Region'], rotation=0, fontsize=12, fontweight="bold")
+    ax.set_xlabel('\n\nCountry/Region', fontsize=18, color="white", fontweight="bold")
+    ax.set_ylabel('Tariff Rate', fontsize=18, color="white", fontweight="bold")
+    ax.tick_params(axis='both', which='major', labelsize=12)
+
+    # Create the legend
+    mfn_label = 'MFN Tariff'
+    fta_label = 'FTA Tariff'
+    legend_labels = [mfn_label, fta_label,'NA']
+    legend_handles = [mfn_bars, fta_bars]
+
+
+    ax.legend(legend_handles, legend_labels, loc='upper left', fontsize=10)
+    # Make the plot background transparent
+    fig.patch.set_alpha(0.9)
+    ax.patch.set_alpha(0.7)
+
+    return fig
+
+
+def tariff_bar_values(tariff_type, tariff_min, tariff_max):
+    # Vectorized form of the bar lengths in tariff_overview_figure: MFN uses the middle of the range, FTA the
+    # upper bound, or the lower bound when the upper one is 0 (out of scope). Missing bounds count as 0.
+    tariff_min = np.nan_to_num(np.asarray(tariff_min, dtype='float64'))
+    tariff_max = np.nan_to_num(np.asarray(tariff_max, dtype='float64'))
+    fta_value = np.where(tariff_max == 0, tariff_min, tariff_max)
+    return np.where(np.asarray(tariff_type) == 'MFN', (tariff_min + tariff_max) / 2, fta_value)
+
+
+@metrics.timed('figure_build')
+def region_heatmap_figure(rows, region):
+    # All import countries of a region in one figure: MFN and FTA heatmaps of country x vehicle type,
+    # built from whole columns with a single hover template instead of one trace and f-string per bar
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    rows = widen_float32(rows.drop_duplicates(['Import Country', 'Vehicle Type', 'Tariff Type']))
+    rows = rows.assign(Value=tariff_bar_values(rows['Tariff Type'], rows['Tariff Min.'], rows['Tariff Max.']))
+    countries = list(pd.unique(rows['Import Country']))
+
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, horizontal_spacing=0.03, subplot_titles=['MFN Tariff', 'FTA Tariff'])
+    for column, (tariff_type, colorscale) in enumerate((('MFN', 'Blues'), ('FTA', 'Greens')), start=1):
+        typed = rows[rows['Tariff Type'] == tariff_type].set_index(['Import Country', 'Vehicle Type'])
+        grid = pd.MultiIndex.from_product([countries, VEHICLE_ORDER])
+        typed = typed.reindex(grid)
+        shape = (len(countries), len(VEHICLE_ORDER))
+        customdata = np.dstack([
+            typed['Tariff Min.'].to_numpy(dtype=object).reshape(shape),
+            typed['Tariff Max.'].to_numpy(dtype=object).reshape(shape),
+            typed['Exceptions/Notes'].fillna('None').to_numpy(dtype=object).reshape(shape),
+        ])
+        fig.add_trace(go.Heatmap(
+            z=typed['Value'].to_numpy().reshape(shape),
+            x=VEHICLE_ORDER,
+            y=[str(country) for country in countries],
+            customdata=customdata,
+            colorscale=colorscale,
+            showscale=False,
+            texttemplate='%{z:.1f}',
+            hovertemplate=(
+                f"<b>%{{y}} - %{{x}}</b><br>{tariff_type}: %{{customdata[0]}} - %{{customdata[1]}}<br>"
+                "Exceptions/Notes: %{customdata[2]}<extra></extra>"
+            ),
+            xgap=2,
+            ygap=2,
+        ), row=1, col=column)
+
+    fig.update_layout(
+        title={'text': f"Tariff Overview (MFN vs FTA) for {region}", 'x': 0.5, 'xanchor': 'center'},
+        height=200 + 28 * len(countries),
+        template='plotly_white',
+        paper_bgcolor='rgba(255, 255, 255, 0.5)',
+        margin=dict(l=100, r=40, t=100, b=40),
+    )
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
+@metrics.timed('figure_build')
+def sourcing_figure(options, import_country):
+    # Landed tariff of every export country into one market, one bar colour per vehicle type, ranges as error bars
+    import plotly.graph_objects as go
+
+    options = widen_float32(options)
+    fig = go.Figure()
+    for vehicle_type in VEHICLE_ORDER:
+        rows = options[options['Vehicle Type'] == vehicle_type]
+        if rows.empty:
+            continue
+        fig.add_trace(go.Bar(
+            y=rows['Export Country'].astype(str),
+            x=rows['Tariff Max.'],
+            name=vehicle_type,
+            orientation='h',
+            error_x=dict(type='data', array=np.zeros(len(rows)), arrayminus=rows['Tariff Max.'] - rows['Tariff Min.']),
+            customdata=np.column_stack([rows['Route'].astype(str), rows['Rank'], rows['Tariff Min.']]),
+            hovertemplate=(
+                f"<b>%{{y}} - {vehicle_type}</b><br>Rank %{{customdata[1]}} via %{{customdata[0]}}<br>"
+                "Tariff: %{customdata[2]} - %{x}<extra></extra>"
+            ),
+        ))
+    fig.update_layout(
+        title={'text': f"Best sourcing into {import_country}", 'x': 0.5, 'xanchor': 'center'},
+        barmode='group',
+        xaxis_title="Landed tariff (%)",
+        yaxis_title="Export Country",
+        legend_title="Vehicle Type",
+        height=200 + 40 * options['Export Country'].nunique(),
+        template='plotly_white',
+        paper_bgcolor='rgba(255, 255, 255, 0.5)',
+    )
+    fig.update_yaxes(categoryorder='total ascending')
+    return fig
+
+
+@metrics.timed('figure_build')
+def phase_down_figure(projection, region, year=None):
+    # Projected FTA rate of every scheduled (import country, vehicle type) of a region over the years, one trace per
+    # vehicle type with the countries separated by gaps instead of one trace per line
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for vehicle_type in VEHICLE_ORDER:
+        rows = projection[projection['Vehicle Type'] == vehicle_type]
+        grid = rows.pivot_table(index='Import Country', columns='Year', values='Tariff Max.', aggfunc='first', observed=True)
+        if grid.empty:
+            continue
+        gap = np.full((len(grid), 1), np.nan)
+        fig.add_trace(go.Scatter(
+            x=np.tile(np.append(grid.columns.to_numpy(dtype='float64'), np.nan), len(grid)),
+            y=np.hstack([grid.to_numpy(dtype='float64'), gap]).ravel(),
+            text=np.repeat(grid.index.astype(str).to_numpy(), grid.shape[1] + 1),
+            name=vehicle_type,
+            mode='lines',
+            connectgaps=False,
+            hovertemplate=f"<b>%{{text}} - {vehicle_type}</b><br>%{{x}}: %{{y:.2f}}%<extra></extra>",
+        ))
+    if year is not None:
+        fig.add_vline(x=year, line_dash='dash', line_color='orange')
+    fig.update_layout(
+        title={'text': f"FTA tariff phase-down for {region}", 'x': 0.5, 'xanchor': 'center'},
+        xaxis_title="Year",
+        yaxis_title="FTA Tariff (%)",
+        legend_title="Vehicle Type",
+        height=600,
+        template='plotly_white',
+        paper_bgcolor='rgba(255, 255, 255, 0.5)',
+    )
+    return fig
+
+
+def figure_key(kind, *parts):
+    # Content hash of everything a figure is built from
+    digest = hashlib.sha256(f"{kind}:{FIGURE_VERSION}".encode())
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            digest.update(repr(list(part.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def figures_folder(folder):
+    return os.path.join(cache_folder(folder), "figures")
+
+
+def _cached_artifact(key, suffix, render, folder):
+    # Bytes from the on-disk figure cache, rendered and stored on a miss
+    path = os.path.join(figures_folder(folder), f"{key}{suffix}")
+    metrics.cache_lookup('figure_disk')
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    metrics.cache_miss('figure_disk')
+    data = render()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = f"{path}.tmp-{os.getpid()}"
+        with open(staging, 'wb') as f:
+            f.write(data)
+        os.replace(staging, path)
+    except OSError:
+        pass  # A read-only data folder just means figures are rebuilt by each process
+    return data
+
+
+def cached_figure_json(key, build, folder):
+    # Serialized Plotly figure from the on-disk figure cache
+    def render():
+        fig = build()
+        with metrics.stage('render'):
+            return fig.to_json().encode('utf-8')
+    return _cached_artifact(key, '.json', render, folder).decode('utf-8')
+
+
+@metrics.timed('render')
+def render_png(fig):
+    # Same settings st.pyplot uses, then release the figure's memory right away
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def tariff_figure_json(country, df, folder, key=None):
+    key = key or figure_key('tariff_overview', country, df)
+    return cached_figure_json(key, lambda: tariff_overview_figure(country, df), folder)
+
+
+def region_heatmap_json(rows, region, folder, key=None):
+    # rows: the tariff table rows of one region
+    key = key or figure_key('region_heatmap', region, rows)
+    return cached_figure_json(key, lambda: region_heatmap_figure(rows, region), folder)
+
+
+def summary_chart_png(sheet_df, folder, key=None):
+    # The summary chart is rasterized once per version of the summary sheet and shared as PNG bytes
+    key = key or figure_key('summary_chart', sheet_df)
+    return _cached_artifact(key, '.png', lambda: render_png(summary_chart_figure(sheet_df)), folder)
+
+
+def warm_figures(excel_file, sha256=None):
+    # Pre-render the summary chart, the region heatmaps and the tariff figure of every (region, import country) of one workbook;
+    # top level so it can run in a worker process
+    folder = os.path.dirname(excel_file)
+    summary = read_summary_tables(excel_file, sha256 or file_sha256(excel_file))
+    keys = []
+    if {'MFN Tariff_Min', 'FTA Tariff_Min'} <= set(summary['overview'].columns):
+        key = figure_key('summary_chart', summary['overview'])
+        summary_chart_png(summary['overview'], folder, key)
+        keys.append(key)
+    tariffs = summary['tariffs']
+    for region in summary['regions']:
+        rows = tariffs[tariffs['Region'] == region]
+        key = figure_key('region_heatmap', region, rows)
+        region_heatmap_json(rows, region, folder, key)
+        keys.append(key)
+        for country, df in region_country_tables(tariffs, region).items():
+            key = figure_key('tariff_overview', country, df)
+            tariff_figure_json(country, df, folder, key)
+            keys.append(key)
+    return {'regions': summary['regions'], 'figures': keys}
+
+
+def prune_figures(folder, keep):
+    # Drop cached figures whose source data no longer exists
+    removed = 0
+    if not os.path.isdir(figures_folder(folder)):
+        return removed
+    for file_name in os.listdir(figures_folder(folder)):
+        if os.path.splitext(file_name)[0] not in keep:
+            os.remove(os.path.join(figures_folder(folder), file_name))
+            removed += 1
+    return removed
@@ -0,0 +1,941 @@
+import datetime
+import functools
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from fta_metrics import metrics
+
+
+
+# Set the folder path containing the FTA data
+FTA_DATA_FOLDER = "FTA_data"
+
+# Everything derived from the workbooks lives in a hidden folder next to them
+CACHE_FOLDER_NAME = ".fta_cache"
+
+SIDECAR_MANIFEST = "manifest.json"
+# Sidecars written by an older version count as missing
+SIDECAR_VERSION = 2
+
+IMPORT_INDEX_FILE = "import_index.json"
+IMPORT_INDEX_VERSION = 1
+
+# The first two sheets of every workbook are the summary and the FTA negotiations, region sheets follow
+REGION_SHEETS_START = 2
+
+# Worker processes are started by a fork server where the platform has one (spawn otherwise) rather than forked from a
+# caller that may run watcher, server and executor threads. Both re-import the parent's main module in every worker, so
+# only the command-line entry points, which have a __main__ guard (fta_build.py, fta_api.py), start process pools;
+# under Streamlit the main module is the app script itself.
+PROCESS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Region sheet columns kept in the per-country tables, renamed where the sheet header spans two cells
+COUNTRY_TABLE_COLUMNS = {
+    'Vehicle Type': 'Vehicle Type',
+    'Tariff Type': 'Tariff Type',
+    'Tariff Rate': 'Tariff Min.',
+    'Unnamed: 4': 'Tariff Max.',
+    'Exceptions/Notes': 'Exceptions/Notes',
+    'Tariff Reduction Years': 'Tariff Reduction Years',
+    'Reduction Rate%': 'Reduction Rate%',
+    'EiF': 'EiF',
+}
+
+# Order of the vehicle and tariff types, on the chart axes and in sorted tables
+VEHICLE_ORDER = ['Others', 'BEV', 'PHEV', 'HEV', 'ICE']
+TARIFF_TYPE_ORDER = ['MFN', 'FTA']
+
+# Declared types of the tariff table columns, applied once when a workbook is summarized
+TARIFF_SCHEMA = {
+    'Vehicle Type': pd.CategoricalDtype(VEHICLE_ORDER, ordered=True),
+    'Tariff Type': pd.CategoricalDtype(TARIFF_TYPE_ORDER, ordered=True),
+    'Tariff Min.': 'float32',
+    'Tariff Max.': 'float32',
+    'Tariff Reduction Years': 'float32',
+    'Reduction Rate%': 'float32',
+    'EiF': 'datetime64[ns]',
+}
+
+# Cell texts that mean "no value" rather than a malformed one
+_MISSING_TEXT = {'', 'NA', 'N/A', '-'}
+
+# Cell texts pd.read_excel reads as missing by default; the streaming reader does the same so row positions agree
+_EXCEL_NA_TEXT = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA',
+    'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+
+# Type codes used to round-trip object columns that mix strings, numbers, dates and times (Arrow columns are single-typed)
+_MIXED_TEXT, _MIXED_INT, _MIXED_FLOAT, _MIXED_DATETIME, _MIXED_BOOL, _MIXED_TIME = range(6)
+
+
+@functools.lru_cache(maxsize=None)
+def _feather():
+    # pyarrow is imported on first use: it adds noticeable import time, and it is optional since
+    # sidecars are only a speed-up and the workbooks are always readable without them
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    return feather
+
+
+def list_workbooks(folder=FTA_DATA_FOLDER):
+    # Excel workbooks in the data folder, excluding temporary files
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.endswith('.xlsx') and not f.startswith('~$')
+    )
+
+
+def export_country_name(excel_file):
+    return os.path.splitext(os.path.basename(excel_file))[0].upper()
+
+
+def workbook_path(country, folder=FTA_DATA_FOLDER):
+    return os.path.join(folder, f"{country.lower()}.xlsx")
+
+
+def cache_folder(folder=FTA_DATA_FOLDER):
+    return os.path.join(folder, CACHE_FOLDER_NAME)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_folder(excel_file):
+    stem = os.path.splitext(os.path.basename(excel_file))[0].lower()
+    return os.path.join(cache_folder(os.path.dirname(excel_file)), "sidecar", stem)
+
+
+def _mixed_code(value):
+    if isinstance(value, bool):
+        return _MIXED_BOOL
+    if isinstance(value, int):
+        return _MIXED_INT
+    if isinstance(value, float):
+        return _MIXED_FLOAT
+    if isinstance(value, datetime.datetime):
+        return _MIXED_DATETIME
+    if isinstance(value, datetime.time):
+        return _MIXED_TIME
+    return _MIXED_TEXT
+
+
+def _encode_sheet(sheet_df):
+    # Columns are stored by position so duplicate or non-string headers survive the round trip
+    encoded = {}
+    mixed = []
+    for position in range(sheet_df.shape[1]):
+        values = sheet_df.iloc[:, position]
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True).startswith('mixed'):
+            mixed.append(position)
+            notna = values.notna()
+            encoded[str(position)] = values.astype(str).where(notna, None)
+            encoded[f"{position}:type"] = values.map(_mixed_code).astype('int8')
+        else:
+            encoded[str(position)] = values.reset_index(drop=True)
+    return pd.DataFrame(encoded).reset_index(drop=True), mixed
+
+
+def _decode_sheet(table, columns, mixed):
+    decoded = {}
+    for position in range(len(columns)):
+        values = table[str(position)]
+        if position in mixed:
+            # Cell by cell into an object array: a pandas assignment would turn datetimes into Timestamps
+            codes = table[f"{position}:type"].to_numpy()
+            values = values.to_numpy(dtype=object, copy=True)
+            for code, convert in (
+                (_MIXED_INT, int),
+                (_MIXED_FLOAT, float),
+                (_MIXED_DATETIME, datetime.datetime.fromisoformat),
+                (_MIXED_BOOL, lambda v: v == 'True'),
+                (_MIXED_TIME, datetime.time.fromisoformat),
+            ):
+                mask = codes == code
+                values[mask] = [convert(value) for value in values[mask]]
+            values = pd.Series(values, dtype=object)
+        decoded[position] = values
+    sheet_df = pd.DataFrame(decoded)
+    sheet_df.columns = [_decode_label(column) for column in columns]
+    return sheet_df
+
+
+def _column_label(column):
+    # JSON keeps text and numeric headers as they are and date and time headers tagged with their ISO form;
+    # anything else is stored as its string form
+    if isinstance(column, (str, int, float)) and not isinstance(column, bool):
+        return column
+    if isinstance(column, datetime.datetime):
+        return {'datetime': column.isoformat()}
+    if isinstance(column, datetime.time):
+        return {'time': column.isoformat()}
+    return str(column)
+
+
+def _decode_label(label):
+    if isinstance(label, dict):
+        if 'datetime' in label:
+            return datetime.datetime.fromisoformat(label['datetime'])
+        return datetime.time.fromisoformat(label['time'])
+    return label
+
+
+def _write_frame(frame, folder, file_name):
+    table, mixed = _encode_sheet(frame)
+    # Uncompressed so the reader can memory-map the file
+    _feather().write_feather(table, os.path.join(folder, file_name), compression='uncompressed')
+    return {'file': file_name, 'columns': [_column_label(c) for c in frame.columns], 'mixed': mixed}
+
+
+def _read_frame(folder, meta, start=None, stop=None):
+    table = _feather().read_table(os.path.join(folder, meta['file']), memory_map=True)
+    if start is not None:
+        # Slicing the memory-mapped table only materializes the requested rows
+        table = table.slice(start, stop - start)
+    return _decode_sheet(table.to_pandas(), meta['columns'], meta['mixed'])
+
+
+def _write_folder(target, write):
+    # Fill a staging folder and swap it into place; readers fall back to the workbook during the short gap
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    manifest = write(staging)
+    with open(os.path.join(staging, SIDECAR_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return manifest
+
+
+def _read_manifest(folder):
+    try:
+        with open(os.path.join(folder, SIDECAR_MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_sidecar(excel_file, workbook=None, sha256=None):
+    # Compile one workbook into a folder of Feather files, one per sheet, plus a manifest with the sheet order and content hash
+    if _feather() is None:
+        raise RuntimeError("pyarrow is required to write sidecar files")
+
+    sha256 = sha256 or file_sha256(excel_file)
+    if workbook is None:
+        workbook = pd.read_excel(excel_file, sheet_name=None)
+
+    def write(staging):
+        sheets = []
+        for index, (sheet_name, sheet_df) in enumerate(workbook.items()):
+            sheets.append({'name': sheet_name, **_write_frame(sheet_df, staging, f"{index:03d}.feather")})
+        return {'version': SIDECAR_VERSION, 'source': os.path.basename(excel_file), 'sha256': sha256, 'sheets': sheets}
+
+    return _write_folder(sidecar_folder(excel_file), write)
+
+
+def read_sidecar_manifest(excel_file):
+    manifest = _read_manifest(sidecar_folder(excel_file))
+    return manifest if manifest is not None and manifest.get('version') == SIDECAR_VERSION else None
+
+
+def _read_sidecar_sheet(excel_file, sheet, start=None, stop=None):
+    return _read_frame(sidecar_folder(excel_file), sheet, start, stop)
+
+
+def read_sidecar(excel_file, sha256=None):
+    # Return the sidecar sheets in workbook order, or None when it is missing or no longer matches the workbook
+    if _feather() is None:
+        return None
+    manifest = read_sidecar_manifest(excel_file)
+    if manifest is None or manifest['sha256'] != (sha256 or file_sha256(excel_file)):
+        return None
+    try:
+        return {sheet['name']: _read_sidecar_sheet(excel_file, sheet) for sheet in manifest['sheets']}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+@metrics.timed('workbook_load')
+def read_sidecar_rows(excel_file, sheet_name, start, stop, sha256=None):
+    # Rows [start, stop) of one sheet straight from the sidecar, or None when it can't be used
+    if _feather() is None:
+        return None
+    manifest = read_sidecar_manifest(excel_file)
+    if manifest is None or manifest['sha256'] != (sha256 or file_sha256(excel_file)):
+        return None
+    for sheet in manifest['sheets']:
+        if sheet['name'] == sheet_name:
+            try:
+                rows = _read_sidecar_sheet(excel_file, sheet, start, stop)
+            except (OSError, KeyError, ValueError):
+                return None
+            rows.index = pd.RangeIndex(start, stop)
+            return rows
+    return None
+
+
+@metrics.timed('workbook_load')
+def read_workbook(excel_file, sha256=None):
+    # Prefer the columnar sidecar and only parse the workbook with openpyxl when it is stale or missing
+    workbook = read_sidecar(excel_file, sha256)
+    if workbook is None:
+        workbook = pd.read_excel(excel_file, sheet_name=None)
+    return workbook
+
+
+def _open_read_only(excel_file):
+    # Read-only mode parses sheets lazily as their rows are iterated, instead of loading every sheet up front
+    from openpyxl import load_workbook
+    return load_workbook(excel_file, read_only=True, data_only=True)
+
+
+def _trimmed_rows(worksheet):
+    # Rows as pd.read_excel's openpyxl reader sees them: empty cells are trimmed from the end of every row and the empty
+    # rows at the end of the sheet are dropped. Empty rows further up are kept (pandas reads them as all-missing rows),
+    # so they are held back until a row with data follows.
+    blank_rows = 0
+    for row in worksheet.iter_rows(values_only=True):
+        row = list(row)
+        while row and (row[-1] is None or row[-1] == ''):
+            row.pop()
+        if not row:
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield []
+        blank_rows = 0
+        yield row
+
+
+def _sheet_rows(worksheet):
+    # Header labels, then the data rows as lists, the way pd.read_excel sees them: the first row is the header, even when
+    # it is empty, empty header cells become 'Unnamed: n' and repeated labels get a '.n' suffix; blank rows are kept and
+    # empty cells and NA texts are NaN. Rows are as long as their last value, _rows_frame pads them and names the columns past
+    # the header. pandas also drops blank rows from sheets only one column wide, which this reader doesn't.
+    rows = _trimmed_rows(worksheet)
+    header = next(rows, None)
+    if header is None:
+        return
+    labels, seen = [], {}
+    for position, label in enumerate(header):
+        label = f"Unnamed: {position}" if label is None or label == '' else label
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        labels.append(label)
+    yield labels
+
+    for row in rows:
+        yield [np.nan if value is None or isinstance(value, str) and value in _EXCEL_NA_TEXT else value for value in row]
+
+
+def _rows_frame(rows, columns, start=0):
+    # Rows wider than the header get 'Unnamed: n' columns, like the padding pandas applies to the widest row
+    width = max([len(columns), *map(len, rows)])
+    columns = list(columns) + [f"Unnamed: {position}" for position in range(len(columns), width)]
+    rows = [row + [np.nan] * (width - len(row)) for row in rows]
+    frame = pd.DataFrame(rows, columns=columns).infer_objects()
+    frame.index = pd.RangeIndex(start, start + len(rows))
+    return frame
+
+
+@metrics.timed('workbook_load')
+def read_sheet(excel_file, sheet_name, nrows=None):
+    # One sheet of a workbook, streamed in read-only mode; with nrows reading stops after that many data rows
+    workbook = _open_read_only(excel_file)
+    try:
+        rows = _sheet_rows(workbook[sheet_name])
+        columns = next(rows, None)
+        if columns is None:
+            return pd.DataFrame()
+        return _rows_frame(list(itertools.islice(rows, nrows)), columns)
+    finally:
+        workbook.close()
+
+
+def iter_country_blocks(excel_file, sheet_name):
+    # Yield (country, rows) for every contiguous country block of a region sheet while the sheet is being read, so only
+    # one block is in memory at a time. Blocks and their row positions match country_block_bounds on the full sheet.
+    workbook = _open_read_only(excel_file)
+    try:
+        rows = _sheet_rows(workbook[sheet_name])
+        columns = next(rows, None)
+        if columns is None or 'Country/Region' not in columns:
+            return
+        country_column = columns.index('Country/Region')
+        country, block, start = None, [], 0
+        for position, row in enumerate(rows):
+            name = row[country_column] if country_column < len(row) else np.nan
+            if pd.notna(name) and name != country:
+                if block:
+                    yield country, _rows_frame(block, columns, start)
+                country, block, start = name, [], position
+            if country is not None:
+                block.append(row)
+        if block:
+            yield country, _rows_frame(block, columns, start)
+    finally:
+        workbook.close()
+
+
+def process_pool(max_workers=None):
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+
+
+def index_workbook_file(excel_file):
+    # Import-index blocks of one workbook, computed where it is parsed so a worker process only sends back the blocks
+    return _index_workbook(read_workbook(excel_file))
+
+
+def iter_index_workbooks(excel_files, max_workers=None, processes=False):
+    # Index workbooks concurrently and yield (excel_file, blocks, error) as each one finishes; a failing file only yields
+    # its own error. With processes the workbooks are parsed in a process pool (openpyxl parsing is CPU bound), which
+    # only the command-line entry points ask for (see PROCESS_START_METHOD); threads are used otherwise.
+    excel_files = list(excel_files)
+    if len(excel_files) <= 1 or max_workers == 1:
+        for excel_file in excel_files:
+            try:
+                yield excel_file, index_workbook_file(excel_file), None
+            except Exception as e:
+                yield excel_file, None, e
+        return
+
+    with (process_pool(max_workers) if processes else ThreadPoolExecutor(max_workers=max_workers)) as pool:
+        futures = {pool.submit(index_workbook_file, excel_file): excel_file for excel_file in excel_files}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                # Also covers a crashed worker (BrokenProcessPool), which fails the files it still had queued
+                yield futures[future], None, e
+
+
+@metrics.timed('segmentation')
+def country_block_bounds(sheet_df):
+    # Split a region sheet into contiguous (country, start, stop) row blocks.
+    # A country is only named on its first row, so the blank cells below it are forward-filled to find where each block ends.
+    codes, _ = pd.factorize(sheet_df['Country/Region'].ffill())
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate(([0], bounds))
+    stops = np.concatenate((bounds, [len(codes)]))
+    countries = sheet_df['Country/Region'].to_numpy()
+    # Rows above the first named country don't belong to any block
+    return [
+        (countries[start], int(start), int(stop))
+        for start, stop in zip(starts, stops)
+        if len(codes) and codes[start] != -1
+    ]
+
+
+def first_country_blocks(sheet_df):
+    # {country: (start, stop)} of the first contiguous block of every country, computed in one pass over the sheet.
+    # Like the original row-by-row scan, a country that reappears further down the sheet only counts once.
+    blocks = {}
+    for country, start, stop in country_block_bounds(sheet_df):
+        blocks.setdefault(country, (start, stop))
+    return blocks
+
+
+def tag_country_block(rows, export_country, sheet_name):
+    # Prefix a row block with the export country and region sheet it was taken from
+    tags = pd.DataFrame({'Export Country': export_country, 'Region': sheet_name}, index=rows.index)
+    return pd.concat([tags, rows], axis=1)
+
+
+def import_country_rows(workbook, import_country, export_country):
+    # Row blocks of one import country from every region sheet of a workbook, sliced rather than copied row by row
+    frames = []
+    for sheet_name in list(workbook.keys())[REGION_SHEETS_START:]:
+        sheet_df = workbook[sheet_name]
+        if 'Country/Region' not in sheet_df.columns:
+            continue
+        bounds = first_country_blocks(sheet_df).get(import_country)
+        if bounds is not None:
+            start, stop = bounds
+            frames.append(tag_country_block(sheet_df.iloc[start:stop], export_country, sheet_name))
+    return frames
+
+
+def read_country_rows(excel_file, sheet_name, start, stop, sha256=None):
+    # One country's row block, sliced from the sidecar when it matches the workbook and streamed from its sheet otherwise
+    rows = read_sidecar_rows(excel_file, sheet_name, start, stop, sha256)
+    if rows is None:
+        # Without a usable sidecar only this sheet is streamed, and only up to the end of the block
+        rows = read_sheet(excel_file, sheet_name, nrows=stop).iloc[start:stop]
+    return rows
+
+
+def import_country_table(folder, index, locations, import_country, read_rows=read_country_rows):
+    # Rows of one import country from every export workbook, found through the import index and tagged with their source.
+    # read_rows can be swapped for a cached reader with the same signature. Returns None when the country is not listed.
+    frames = []
+    for file_name, export_country, sheet_name, start, stop in locations.get(import_country, []):
+        sha256 = index['workbooks'][file_name]['sha256']
+        rows = read_rows(os.path.join(folder, file_name), sheet_name, start, stop, sha256)
+        frames.append(tag_country_block(rows, export_country, sheet_name))
+    return pd.concat(frames) if frames else None
+
+
+def iter_import_country_rows(folder, index, locations, import_country, read_rows=read_country_rows, max_workers=None):
+    # Streaming counterpart of import_country_table: the row blocks are read in a thread pool (Feather reads release the GIL)
+    # and yielded as (position, count, tagged rows, error) as each one arrives. position is the block's place in the
+    # locations list, so callers can keep the stable order while showing partial results; a failing block only yields its error.
+    blocks = locations.get(import_country, [])
+    if not blocks:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for position, (file_name, _, sheet_name, start, stop) in enumerate(blocks):
+            sha256 = index['workbooks'][file_name]['sha256']
+            futures[pool.submit(read_rows, os.path.join(folder, file_name), sheet_name, start, stop, sha256)] = position
+        for future in as_completed(futures):
+            position = futures[future]
+            _, export_country, sheet_name, _, _ = blocks[position]
+            try:
+                yield position, len(blocks), tag_country_block(future.result(), export_country, sheet_name), None
+            except Exception as e:
+                yield position, len(blocks), None, e
+
+
+@metrics.timed('segmentation')
+def segment_region_sheet(sheet_df, sheet_rows=False):
+    # Split a region sheet into one table per country, keyed by country in order of appearance.
+    # Country and vehicle type are only written on the first row of their block, so both are forward-filled
+    # (the vehicle type within its country); rows above the first named country are dropped.
+    # With sheet_rows the tables also get a 'Sheet Row' column with the Excel row number of every row (the header is row 1).
+    country = sheet_df['Country/Region'].ffill()
+    tables = sheet_df[list(COUNTRY_TABLE_COLUMNS)].rename(columns=COUNTRY_TABLE_COLUMNS)
+    if sheet_rows:
+        tables['Sheet Row'] = np.arange(2, len(sheet_df) + 2)
+    tables['Vehicle Type'] = tables['Vehicle Type'].groupby(country, sort=False).ffill().fillna('')
+    return {name: group.reset_index(drop=True) for name, group in tables.groupby(country, sort=False)}
+
+
+@metrics.timed('range_parsing')
+def parse_tariff_range(values):
+    # Parse tariff cells such as "2.5-10", "NA - 5", "NA" or plain numbers into float64 'min'/'max' columns
+    # rounded to 2 decimals. Missing or unreadable values become NaN; a range with an unreadable bound is NaN on both sides.
+    values = pd.Series(values, dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'mixed', 'mixed-integer'):
+        text = values.str.strip().str.upper()
+    else:
+        text = pd.Series(np.nan, index=values.index, dtype=object)
+    is_text = text.notna()
+
+    # Numeric cells use the same value for both bounds
+    single = pd.to_numeric(values.where(~is_text), errors='coerce')
+
+    parts = text.str.partition('-') if is_text.any() else pd.DataFrame({0: text, 1: text, 2: text})
+    has_dash = parts[1].eq('-')
+    lower_text = parts[0].str.strip()
+    upper_text = parts[2].str.strip()
+    lower = pd.to_numeric(lower_text, errors='coerce')
+    upper = pd.to_numeric(upper_text, errors='coerce')
+    unreadable = has_dash & ((lower.isna() & lower_text.ne('NA')) | (upper.isna() & upper_text.ne('NA')))
+
+    bounds = pd.DataFrame({
+        'min': np.where(is_text, lower.where(~unreadable), single),
+        'max': np.where(is_text, np.where(has_dash, upper.where(~unreadable), lower), single),
+    }, index=values.index, dtype='float64')
+    return bounds.round(2)
+
+
+def import_index_path(folder=FTA_DATA_FOLDER):
+    return os.path.join(cache_folder(folder), IMPORT_INDEX_FILE)
+
+
+def _index_workbook(workbook):
+    # Map each import country to the row block it occupies in every region sheet of one workbook
+    blocks = {}
+    for sheet_name in list(workbook.keys())[REGION_SHEETS_START:]:
+        sheet_df = workbook[sheet_name]
+        if 'Country/Region' not in sheet_df.columns:
+            continue
+        for country, (start, stop) in first_country_blocks(sheet_df).items():
+            # Only text names can be selected in the UI
+            if isinstance(country, str):
+                blocks.setdefault(country, []).append([sheet_name, start, stop])
+    return blocks
+
+
+def load_import_index(folder=FTA_DATA_FOLDER):
+    try:
+        with open(import_index_path(folder), encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'version': IMPORT_INDEX_VERSION, 'workbooks': {}}
+    if index.get('version') != IMPORT_INDEX_VERSION:
+        return {'version': IMPORT_INDEX_VERSION, 'workbooks': {}}
+    return index
+
+
+# The catalog thread and the session or request threads of one process update the index concurrently
+_import_index_lock = threading.Lock()
+
+
+def save_import_index(index, folder=FTA_DATA_FOLDER):
+    # Staged in a file of its own, so concurrent writers (e.g. the app and fta_build.py) never share a staging file
+    path = import_index_path(folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, staging = tempfile.mkstemp(prefix=f"{IMPORT_INDEX_FILE}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with open(descriptor, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+
+
+def update_import_index(folder=FTA_DATA_FOLDER, index=None, max_workers=None, processes=False):
+    # Bring the persisted index in line with the folder, re-reading only workbooks whose content changed.
+    # Workbooks that fail to load are left out and listed under 'errors' so they are retried on the next update.
+    # Updates within a process run one at a time, so a waiting update starts from the index the previous one saved.
+    # processes is for the command-line entry points only, see iter_index_workbooks.
+    with _import_index_lock:
+        return _update_import_index(folder, index, max_workers, processes)
+
+
+def _update_import_index(folder, index, max_workers, processes):
+    index = load_import_index(folder) if index is None else index
+    workbooks = index['workbooks']
+    errors = index.setdefault('errors', {})
+    changed = False
+
+    present = set()
+    stale = {}
+    for excel_file in list_workbooks(folder):
+        name = os.path.basename(excel_file)
+        present.add(name)
+        stat = os.stat(excel_file)
+        entry = workbooks.get(name)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            continue
+
+        sha256 = file_sha256(excel_file)
+        if entry is not None and entry['sha256'] == sha256:
+            # Touched but unchanged, only the stat needs refreshing
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        else:
+            workbooks.pop(name, None)
+            stale[excel_file] = {'sha256': sha256, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        changed = True
+
+    for excel_file, blocks, error in iter_index_workbooks(stale, max_workers, processes):
+        name = os.path.basename(excel_file)
+        if error is not None:
+            errors[name] = str(error)
+            continue
+        errors.pop(name, None)
+        workbooks[name] = {
+            **stale[excel_file],
+            'export_country': export_country_name(excel_file),
+            'blocks': blocks,
+        }
+
+    for name in (set(workbooks) | set(errors)) - present:
+        workbooks.pop(name, None)
+        errors.pop(name, None)
+        changed = True
+
+    if changed:
+        try:
+            save_import_index(index, folder)
+        except OSError:
+            pass  # A read-only data folder still gets a working in-memory index
+    return index
+
+
+def import_locations(index):
+    # Invert the per-workbook entries into {import country: [(file name, export country, sheet, start, stop), ...]}
+    locations = {}
+    for name in sorted(index['workbooks']):
+        entry = index['workbooks'][name]
+        for country, blocks in entry['blocks'].items():
+            for sheet_name, start, stop in blocks:
+                locations.setdefault(country, []).append((name, entry['export_country'], sheet_name, start, stop))
+    return locations
+
+
+def _is_missing(values):
+    return values.isna() | values.astype(str).str.strip().str.upper().isin(_MISSING_TEXT)
+
+
+def _parse_numbers(values):
+    # Numbers, numeric text and percentages such as "10%"; anything else is NaN
+    values = pd.Series(values, dtype=object)
+    text = values.map(lambda v: v.strip().rstrip('%') if isinstance(v, str) else v)
+    return pd.to_numeric(text, errors='coerce')
+
+
+def _parse_dates(values):
+    # Dates and date text; bare numbers are not taken for timestamps
+    values = pd.Series(values, dtype=object)
+    is_number = values.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+    return pd.to_datetime(values.where(~is_number), errors='coerce', format='mixed').dt.normalize()
+
+
+def apply_tariff_schema(tariffs, sheet_rows=None):
+    # Cast the tariff table to TARIFF_SCHEMA and report the cells that don't fit it.
+    # Returns (typed table, issues) where issues has one row per malformed cell; malformed cells become missing values.
+    # sheet_rows (aligned with tariffs) are the Excel row numbers reported as 'Row', the table positions otherwise.
+    rows = np.arange(len(tariffs)) if sheet_rows is None else np.asarray(sheet_rows)
+    typed = tariffs.copy()
+    problems = []
+    for column, dtype in TARIFF_SCHEMA.items():
+        values = tariffs[column]
+        if isinstance(dtype, pd.CategoricalDtype):
+            typed[column] = pd.Categorical(values.map(lambda v: v.strip() if isinstance(v, str) else v), dtype=dtype)
+            bad = typed[column].isna()
+            problems.append((bad & _is_missing(values), column, f"missing {column.lower()}"))
+            problems.append((bad & ~_is_missing(values), column, f"unknown {column.lower()}"))
+            continue
+        if dtype == 'datetime64[ns]':
+            typed[column], problem = _parse_dates(values).astype(dtype), "unreadable date"
+        else:
+            typed[column], problem = _parse_numbers(values).astype(dtype), "not a number"
+        problems.append((typed[column].isna() & ~_is_missing(values), column, problem))
+    # A maximum of 0 marks an FTA rate as out of scope, so only positive maximums are compared
+    inverted = (typed['Tariff Max.'] > 0) & (typed['Tariff Min.'] > typed['Tariff Max.'])
+    problems.append((inverted, 'Tariff Min.', "minimum above maximum"))
+
+    issues = [
+        pd.DataFrame({
+            '_position': np.flatnonzero(mask),
+            'Row': rows[mask.to_numpy()],
+            'Region': tariffs['Region'][mask].astype(str),
+            'Import Country': tariffs['Import Country'][mask].astype(str),
+            'Column': column,
+            'Value': tariffs[column][mask].astype(str),
+            'Problem': problem,
+        })
+        for mask, column, problem in problems if mask.any()
+    ]
+    columns = ['Row', 'Region', 'Import Country', 'Column', 'Value', 'Problem']
+    if not issues:
+        return typed, pd.DataFrame(columns=columns)
+    # In table order, which is sheet order and then row order
+    issues = pd.concat(issues, ignore_index=True).sort_values('_position', kind='stable')
+    return typed, issues[columns].reset_index(drop=True)
+
+
+def widen_float32(frame, decimals=2):
+    # float32 columns as float64 rounded to the workbook's precision, for display and JSON:
+    # the float32 of 1.9 would otherwise print as 1.899999976158142
+    columns = [column for column, dtype in frame.dtypes.items() if dtype == np.float32]
+    if not columns:
+        return frame
+    return frame.astype(dict.fromkeys(columns, 'float64')).round(dict.fromkeys(columns, decimals))
+
+
+def summary_tables_folder(excel_file):
+    stem = os.path.splitext(os.path.basename(excel_file))[0].lower()
+    return os.path.join(cache_folder(os.path.dirname(excel_file)), "tables", stem)
+
+
+def summarize_workbook(workbook, export_country):
+    # Normalize one workbook into the tables the app filters and plots:
+    #   tariffs      one row per (region, import country, vehicle type, tariff type), typed by TARIFF_SCHEMA
+    #   tariff_issues the validation report of the tariffs table
+    #   overview     the summary sheet with parsed MFN/FTA min, max and mean columns
+    #   negotiations the FTA negotiations sheet (None when the workbook has no second sheet)
+    sheets = list(workbook.items())
+    summary = {'regions': [], 'region_lc': {}, 'region_errors': {}}
+
+    tariff_blocks, sheet_rows = [], []
+    for sheet_name, sheet_df in sheets[REGION_SHEETS_START:]:
+        summary['regions'].append(sheet_name)
+        summary['region_lc'][sheet_name] = next((str(c) for c in sheet_df.columns if str(c).startswith("LC")), None)
+        try:
+            country_dfs = segment_region_sheet(sheet_df, sheet_rows=True)
+        except KeyError as e:
+            # Kept so the app can report the broken sheet when it is selected
+            summary['region_errors'][sheet_name] = f"missing column {e}"
+            continue
+        for country, table in country_dfs.items():
+            # Only kept to point the validation report at the cells in the workbook
+            sheet_rows.append(table.pop('Sheet Row').to_numpy())
+            table.insert(0, 'Import Country', country)
+            table.insert(0, 'Region', sheet_name)
+            table.insert(0, 'Export Country', export_country)
+            tariff_blocks.append(table)
+
+    tariff_columns = ['Export Country', 'Region', 'Import Country', *COUNTRY_TABLE_COLUMNS.values()]
+    tariffs = pd.concat(tariff_blocks, ignore_index=True) if tariff_blocks else pd.DataFrame(columns=tariff_columns)
+    summary['tariffs'], summary['tariff_issues'] = apply_tariff_schema(
+        tariffs, np.concatenate(sheet_rows) if sheet_rows else None,
+    )
+
+    overview = sheets[0][1].copy() if sheets else pd.DataFrame()
+    for column in ('MFN Tariff', 'FTA Tariff'):
+        if column in overview.columns:
+            bounds = parse_tariff_range(overview[column])
+            overview[f"{column}_Min"] = bounds['min']
+            overview[f"{column}_Max"] = bounds['max']
+            overview[f"{column}_Mean"] = (bounds['min'] + bounds['max']) / 2
+    overview.insert(0, 'Export Country', export_country)
+    summary['overview'] = overview
+
+    if len(sheets) > 1:
+        negotiations = sheets[1][1].copy()
+        negotiations.insert(0, 'Export Country', export_country)
+        summary['negotiations'] = negotiations
+    else:
+        summary['negotiations'] = None
+    return summary
+
+
+# Bump whenever the compiled tables change shape, so tables compiled by older code are recompiled
+SUMMARY_TABLES_VERSION = 4
+
+SUMMARY_TABLES = ('tariffs', 'tariff_issues', 'overview', 'negotiations')
+SUMMARY_METADATA = ('regions', 'region_lc', 'region_errors')
+
+# Repetitive text columns of the summary tables, held as categoricals (small integer codes plus one copy of each label)
+CATEGORICAL_COLUMNS = {
+    'tariffs': ['Export Country', 'Region', 'Import Country', 'Vehicle Type', 'Tariff Type'],
+    'overview': ['Export Country', 'Country/Region', 'LC'],
+    'negotiations': ['Export Country', 'Country/Region', 'Negotiation Status'],
+}
+
+
+def write_summary_tables(excel_file, sha256=None):
+    # Compile one workbook's summary tables to Feather; top level so it can run in a worker process
+    if _feather() is None:
+        raise RuntimeError("pyarrow is required to write summary tables")
+
+    sha256 = sha256 or file_sha256(excel_file)
+    summary = summarize_workbook(read_workbook(excel_file, sha256), export_country_name(excel_file))
+
+    def write(staging):
+        frames = {
+            name: _write_frame(summary[name], staging, f"{name}.feather")
+            for name in SUMMARY_TABLES if summary[name] is not None
+        }
+        metadata = {key: summary[key] for key in SUMMARY_METADATA}
+        return {
+            'version': SUMMARY_TABLES_VERSION, 'source': os.path.basename(excel_file), 'sha256': sha256, **metadata,
+            'issue_count': len(summary['tariff_issues']), 'frames': frames,
+        }
+
+    return _write_folder(summary_tables_folder(excel_file), write)
+
+
+def compact_summary_tables(summary):
+    # Convert the repetitive columns in place; columns that also hold numbers or dates are left as they are
+    for name, columns in CATEGORICAL_COLUMNS.items():
+        frame = summary[name]
+        if frame is None:
+            continue
+        for column in columns:
+            if column in frame.columns and pd.api.types.infer_dtype(frame[column], skipna=True) == 'string':
+                frame[column] = frame[column].astype('category')
+    return summary
+
+
+def read_summary_tables_manifest(excel_file):
+    # Tables compiled by an older version count as missing
+    manifest = _read_manifest(summary_tables_folder(excel_file))
+    if manifest is None or manifest.get('version') != SUMMARY_TABLES_VERSION:
+        return None
+    return manifest
+
+
+@metrics.timed('workbook_load')
+def read_summary_tables(excel_file, sha256=None):
+    # Load the compiled tables when they match the workbook, otherwise summarize it on the fly
+    sha256 = sha256 or file_sha256(excel_file)
+    folder = summary_tables_folder(excel_file)
+    manifest = read_summary_tables_manifest(excel_file)
+    if _feather() is not None and manifest is not None and manifest['sha256'] == sha256:
+        try:
+            summary = {key: manifest[key] for key in SUMMARY_METADATA}
+            for name in SUMMARY_TABLES:
+                meta = manifest['frames'].get(name)
+                summary[name] = None if meta is None else _read_frame(folder, meta)
+            return compact_summary_tables(summary)
+        except (OSError, KeyError, ValueError):
+            pass
+    return compact_summary_tables(summarize_workbook(read_workbook(excel_file, sha256), export_country_name(excel_file)))
+
+
+def read_summary_arrow(excel_file, sha256=None):
+    # The compiled summary tables as memory-mapped Arrow tables with their real column names, for engines that scan Arrow
+    # without copying. Mixed-type columns are given as their text form. None when the compiled tables can't be used.
+    sha256 = sha256 or file_sha256(excel_file)
+    folder = summary_tables_folder(excel_file)
+    manifest = read_summary_tables_manifest(excel_file)
+    if _feather() is None or manifest is None or manifest['sha256'] != sha256:
+        return None
+    tables = {}
+    try:
+        for name in SUMMARY_TABLES:
+            meta = manifest['frames'].get(name)
+            if meta is None:
+                continue
+            table = _feather().read_table(os.path.join(folder, meta['file']), memory_map=True)
+            table = table.select([str(position) for position in range(len(meta['columns']))])
+            tables[name] = table.rename_columns([str(_decode_label(column)) for column in meta['columns']])
+    except (OSError, KeyError, ValueError):
+        return None
+    return tables
+
+
+def negotiation_records(negotiations):
+    # The negotiations sheet prepared once for filtering and sorting: '_updated' holds 'Last Update' as a date (the
+    # column itself keeps its text) and '_search' the lower-case text of the whole row that searches match against
+    records = negotiations.reset_index(drop=True)
+    columns = [column for column in records.columns if column != 'Export Country']
+    updated = records['Last Update'] if 'Last Update' in records.columns else pd.Series(None, index=records.index, dtype=object)
+    text = [records[column].astype(str).where(records[column].notna(), '') for column in columns]
+    search = text[0].str.cat(text[1:], sep=' ') if text else pd.Series('', index=records.index)
+    return records.assign(_updated=_parse_dates(updated), _search=search.str.lower())
+
+
+def filter_negotiations(records, search=None, statuses=None, updated_from=None, updated_to=None):
+    # Rows of negotiation_records matching all of the given filters; the dates are inclusive
+    mask = pd.Series(True, index=records.index)
+    if search:
+        mask &= records['_search'].str.contains(search.lower(), regex=False)
+    if statuses:
+        mask &= records['Negotiation Status'].isin(statuses)
+    if updated_from is not None:
+        mask &= records['_updated'] >= pd.Timestamp(updated_from)
+    if updated_to is not None:
+        mask &= records['_updated'] <= pd.Timestamp(updated_to)
+    return records[mask]
+
+
+def sort_negotiations(records, column, descending=False):
+    # 'Last Update' sorts by date; rows without a value go last either way
+    key = '_updated' if column == 'Last Update' else column
+    return records.sort_values(key, ascending=not descending, na_position='last', kind='stable')
+
+
+def region_country_tables(tariffs, region):
+    # Per-country tables of one region in sheet order, shaped like the output of segment_region_sheet
+    rows = tariffs[tariffs['Region'] == region]
+    return {
+        country: group[list(COUNTRY_TABLE_COLUMNS.values())].reset_index(drop=True)
+        for country, group in rows.groupby('Import Country', sort=False, observed=True)
+    }
@@ -0,0 +1,166 @@
+import os
+import re
+
+import pandas as pd
+
+from fta_data import TARIFF_SCHEMA, cache_folder, export_country_name, list_workbooks, read_summary_tables
+from fta_metrics import metrics
+
+
+# Downloads of tariff data as CSV, Parquet or multi-sheet Excel, written chunk by chunk so an export never holds a
+# second full copy of its rows. The input is a sequence of (name, frame) pairs: one Excel sheet each, or one after
+# another in CSV and Parquet (where the frames share their columns and sheet_column, when given, carries the name).
+
+# Format -> MIME type
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Rows converted and written at a time
+CHUNK_ROWS = 50000
+
+# Data rows per Excel sheet (the limit is 1,048,576 including the header); longer tables continue on a new sheet
+MAX_EXCEL_ROWS = 1048575
+
+
+def _chunks(frame, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def _tagged_chunks(sheets, sheet_column=None):
+    for name, frame in sheets:
+        for chunk in _chunks(frame):
+            if sheet_column is not None:
+                chunk = chunk.copy()
+                chunk.insert(0, sheet_column, name)
+            yield chunk
+
+
+def iter_csv(sheets, sheet_column=None):
+    # CSV as a stream of byte chunks, header first, for writing to a file or sending as a streaming HTTP response
+    header = True
+    for chunk in _tagged_chunks(sheets, sheet_column):
+        yield chunk.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+def _arrow_type(pa, dtype):
+    # Declared numbers and dates keep their type, categories and everything undeclared are written as text
+    if dtype is None or isinstance(dtype, pd.CategoricalDtype):
+        return pa.string()
+    return pa.from_numpy_dtype(pd.api.types.pandas_dtype(dtype))
+
+
+def _parquet_values(chunk, schema, declared):
+    # The chunk cast to the writer's schema. The schema is declared rather than taken from the first frame, since the same
+    # column can be all-missing floats in one workbook and text in the next
+    values = {}
+    for column in schema.names:
+        series = chunk[column] if column in chunk.columns else pd.Series(None, index=chunk.index, dtype=object)
+        dtype = declared.get(column)
+        if dtype is None or isinstance(dtype, pd.CategoricalDtype):
+            values[column] = series.astype(object).map(str).where(series.notna(), None)
+        else:
+            values[column] = series.astype(dtype)
+    return pd.DataFrame(values, index=chunk.index)
+
+
+def write_parquet(sheets, target, sheet_column=None, schema=None):
+    # One row group per chunk; target is a path or a binary file object. schema ({column: dtype}, e.g. TARIFF_SCHEMA)
+    # declares the typed columns, the others are written as text
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    declared = {str(column): dtype for column, dtype in (schema or {}).items()}
+    writer = None
+    try:
+        for chunk in _tagged_chunks(sheets, sheet_column):
+            chunk = chunk.rename(columns=str)
+            if writer is None:
+                arrow_schema = pa.schema([(column, _arrow_type(pa, declared.get(column))) for column in chunk.columns])
+                writer = pq.ParquetWriter(target, arrow_schema)
+            values = _parquet_values(chunk, arrow_schema, declared)
+            writer.write_table(pa.Table.from_pandas(values, schema=arrow_schema, preserve_index=False))
+        if writer is None:
+            pq.write_table(pa.table({}), target)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _sheet_title(name, part, used):
+    # Excel sheet names are at most 31 characters, without []:*?/\ and unique in the workbook
+    title = re.sub(r'[\[\]:*?/\\]', ' ', str(name)).strip() or "Sheet"
+    suffix = f" ({part + 1})" if part else ""
+    title = f"{title[:31 - len(suffix)]}{suffix}"
+    base, number = title, 1
+    while title.lower() in used:
+        number += 1
+        title = f"{base[:31 - len(str(number)) - 1]}~{number}"
+    used.add(title.lower())
+    return title
+
+
+def write_excel(sheets, target):
+    # Write-only mode streams the rows to disk as they are appended instead of building the workbook in memory
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for name, frame in sheets:
+        for part, start in enumerate(range(0, max(len(frame), 1), MAX_EXCEL_ROWS)):
+            sheet = workbook.create_sheet(_sheet_title(name, part, used))
+            sheet.append([str(column) for column in frame.columns])
+            for chunk in _chunks(frame.iloc[start:start + MAX_EXCEL_ROWS]):
+                # Python values with None for every kind of missing value, which Excel shows as empty cells
+                values = chunk.astype(object).where(chunk.notna(), None)
+                for row in values.itertuples(index=False, name=None):
+                    sheet.append(row)
+    if not workbook.worksheets:
+        workbook.create_sheet("Sheet").append([])
+    workbook.save(target)
+
+
+@metrics.timed('export')
+def write_export(sheets, export_format, target, sheet_column=None, schema=None):
+    # target is a path or a binary file object; schema only types the Parquet columns (see write_parquet)
+    if export_format == 'csv':
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, 'wb') as f:
+                f.writelines(iter_csv(sheets, sheet_column))
+        else:
+            target.writelines(iter_csv(sheets, sheet_column))
+    elif export_format == 'parquet':
+        write_parquet(sheets, target, sheet_column, schema)
+    elif export_format == 'xlsx':
+        write_excel(sheets, target)
+    else:
+        raise ValueError(f"unknown export format {export_format!r}")
+
+
+def exports_folder(folder):
+    return os.path.join(cache_folder(folder), "exports")
+
+
+def lake_sheets(folder, read_tables=read_summary_tables):
+    # (export country, tariff table) of every workbook, read one workbook at a time
+    for excel_file in list_workbooks(folder):
+        yield export_country_name(excel_file), read_tables(excel_file)['tariffs']
+
+
+def export_lake(folder, export_format, path=None):
+    # The tariff tables of the whole lake in one file (one sheet per export country in Excel). Written to a staging
+    # file and swapped into place, so a half-written export is never served; top level so it can run in a worker process
+    path = path or os.path.join(exports_folder(folder), f"fta_lake.{export_format}")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    staging = f"{path}.tmp-{os.getpid()}"
+    try:
+        write_export(lake_sheets(folder), export_format, staging, schema=TARIFF_SCHEMA)
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    return path
@@ -0,0 +1,141 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+
+# Process-wide timings and cache counters for the hot path, exported in the Prometheus text format.
+# Stages: directory_scan, workbook_load, segmentation, range_parsing, figure_build, render (figure serialization
+# and rasterization), display (handing the result to Streamlit) and rerun (the whole script).
+# Peak memory per stage is only measured with FTA_TRACE_MEMORY=1, since tracemalloc slows allocation down.
+# With FTA_METRICS_FILE set the app rewrites that file after every rerun (for the node_exporter textfile collector).
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Every session thread rewrites the textfile after its rerun, through the same staging file
+        self._write_lock = threading.Lock()
+        self._stages = {}
+        self._caches = {}
+        self._active = threading.local()
+
+    def enable_memory_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, name, seconds, peak_bytes=None):
+        with self._lock:
+            stage = self._stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': None})
+            stage['count'] += 1
+            stage['seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+            if peak_bytes is not None:
+                stage['peak_bytes'] = max(stage['peak_bytes'] or 0, peak_bytes)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # A stage nested in another stage of the same name (e.g. read_workbook reading sidecar sheets) is only counted once.
+        # tracemalloc keeps a single peak per process, so a nested stage folds the peak so far into its parent's before
+        # resetting it, and its own peak into the parent's when it ends.
+        active = self._active.__dict__.setdefault('names', [])
+        peaks = self._active.__dict__.setdefault('peaks', [])
+        if name in active:
+            yield
+            return
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_bytes, peak = tracemalloc.get_traced_memory()
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            tracemalloc.reset_peak()
+            peaks.append(start_bytes)
+        active.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            active.remove(name)
+            peak_bytes = None
+            if tracing:
+                peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak)
+                peak_bytes = peak - start_bytes
+            self.record(name, seconds, peak_bytes)
+
+    def timed(self, name):
+        # Decorator form of stage()
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def cache_lookup(self, cache):
+        with self._lock:
+            self._caches.setdefault(cache, {'lookups': 0, 'misses': 0})['lookups'] += 1
+
+    def cache_miss(self, cache):
+        with self._lock:
+            self._caches.setdefault(cache, {'lookups': 0, 'misses': 0})['misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            caches = {
+                name: {'hits': max(counts['lookups'] - counts['misses'], 0), 'misses': counts['misses']}
+                for name, counts in self._caches.items()
+            }
+        return {'stages': stages, 'caches': caches}
+
+    def prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP fta_stage_seconds Wall time spent in each stage.",
+            "# TYPE fta_stage_seconds summary",
+        ]
+        for name, stage in sorted(snapshot['stages'].items()):
+            lines.append(f'fta_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}')
+            lines.append(f'fta_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        lines += [
+            "# HELP fta_stage_max_seconds Slowest single run of each stage.",
+            "# TYPE fta_stage_max_seconds gauge",
+        ]
+        for name, stage in sorted(snapshot['stages'].items()):
+            lines.append(f'fta_stage_max_seconds{{stage="{name}"}} {stage["max_seconds"]:.6f}')
+        lines += [
+            "# HELP fta_stage_peak_bytes Largest peak of traced memory allocated within each stage.",
+            "# TYPE fta_stage_peak_bytes gauge",
+        ]
+        for name, stage in sorted(snapshot['stages'].items()):
+            if stage['peak_bytes'] is not None:
+                lines.append(f'fta_stage_peak_bytes{{stage="{name}"}} {stage["peak_bytes"]}')
+        lines += [
+            "# HELP fta_cache_requests_total Cache lookups by cache and result.",
+            "# TYPE fta_cache_requests_total counter",
+        ]
+        for name, counts in sorted(snapshot['caches'].items()):
+            lines.append(f'fta_cache_requests_total{{cache="{name}",result="hit"}} {counts["hits"]}')
+            lines.append(f'fta_cache_requests_total{{cache="{name}",result="miss"}} {counts["misses"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        text = self.prometheus()
+        staging = f"{path}.tmp-{os.getpid()}"
+        with self._write_lock:
+            with open(staging, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(staging, path)
+
+
+metrics = Metrics()
+
+if os.environ.get('FTA_TRACE_MEMORY') == '1':
+    metrics.enable_memory_tracing()
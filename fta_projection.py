@@ -0,0 +1,65 @@
+import datetime
+
+import numpy as np
+
+from fta_metrics import metrics
+
+
+# Year-by-year phase-down of the FTA tariffs from their entry into force (EiF).
+# An FTA rate is cut by Reduction Rate% of its starting value every year after EiF, for Tariff Reduction Years years
+# (in equal steps to 0 when only the years are given, until it reaches 0 when only the rate is given). Before EiF the
+# FTA doesn't apply yet and the projected rate is missing. MFN rates and FTA rates without a schedule stay as they are.
+# Every row is projected at once by broadcasting over a (rows x years) grid.
+
+PROJECTION_KEYS = ['Export Country', 'Region', 'Import Country', 'Vehicle Type', 'Tariff Type']
+
+# Most years projected before and after the current year when the range isn't given
+MAX_PROJECTION_YEARS = 30
+
+
+def _projection_years(eif_year, end_year, first_year, last_year):
+    # The default range always includes the current year, however old the earliest FTA is
+    this_year = datetime.date.today().year
+    if first_year is None:
+        first_year = int(min(this_year, np.min(eif_year, initial=this_year)))
+        first_year = max(first_year, this_year - MAX_PROJECTION_YEARS)
+    if last_year is None:
+        last_year = int(max(this_year, np.max(end_year[np.isfinite(end_year)], initial=this_year)))
+        last_year = min(last_year, this_year + MAX_PROJECTION_YEARS)
+    return np.arange(first_year, last_year + 1)
+
+
+@metrics.timed('projection')
+def project_tariffs(tariffs, first_year=None, last_year=None):
+    # Long table of PROJECTION_KEYS x Year with the projected 'Tariff Min.' / 'Tariff Max.' and whether the row has a schedule
+    eif_year = tariffs['EiF'].dt.year.to_numpy(dtype='float64', na_value=np.nan)
+    reduction_years = tariffs['Tariff Reduction Years'].to_numpy(dtype='float64', na_value=np.nan)
+    rate = tariffs['Reduction Rate%'].to_numpy(dtype='float64', na_value=np.nan)
+    with np.errstate(divide='ignore'):
+        rate = np.where(np.isnan(rate) & (reduction_years > 0), 100 / reduction_years, rate)
+        # Without a number of years the cuts go on until the rate reaches 0
+        steps = np.where(np.isnan(reduction_years), np.ceil(100 / rate), reduction_years)
+    scheduled = (tariffs['Tariff Type'] == 'FTA').to_numpy() & ~np.isnan(eif_year) & (rate > 0)
+
+    years = _projection_years(eif_year[scheduled], (eif_year + steps)[scheduled], first_year, last_year)
+    elapsed = years[np.newaxis, :] - eif_year[:, np.newaxis]
+    factor = 1 - rate[:, np.newaxis] / 100 * np.clip(elapsed, 0, steps[:, np.newaxis])
+    factor = np.where(elapsed < 0, np.nan, np.clip(factor, 0, 1))
+    factor = np.where(scheduled[:, np.newaxis], factor, 1)
+
+    row_count, year_count = factor.shape
+    projection = tariffs[PROJECTION_KEYS].iloc[np.repeat(np.arange(row_count), year_count)].reset_index(drop=True)
+    projection['Year'] = np.tile(years, row_count)
+    for column in ('Tariff Min.', 'Tariff Max.'):
+        base = tariffs[column].to_numpy(dtype='float64', na_value=np.nan)
+        projection[column] = (base[:, np.newaxis] * factor).ravel().astype('float32')
+    projection['Scheduled'] = np.repeat(scheduled, year_count)
+    return projection
+
+
+def tariff_in_year(projection, year, max_rate=None):
+    # The projected rates of one year, optionally only those at or below max_rate
+    rows = projection[projection['Year'] == year]
+    if max_rate is not None:
+        rows = rows[rows['Tariff Max.'].fillna(rows['Tariff Min.']) <= max_rate]
+    return rows
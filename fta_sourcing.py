@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from fta_data import COUNTRY_TABLE_COLUMNS, list_workbooks, read_summary_tables
+from fta_metrics import metrics
+
+
+# Best sourcing: for each import country and vehicle type, rank the export countries by the tariff their cars land with.
+# The tariff tables of the whole lake are concatenated into one columnar frame and every option is ranked in a single
+# vectorized pass; queries then only slice the ranking. For what-if scenarios, edit a copy of the lake tariffs and rank it again.
+
+# A ranked option is one export country's route into one market for one vehicle type: its FTA rate when the FTA covers
+# the vehicle type, or the MFN rate
+SOURCING_KEYS = ['Import Country', 'Vehicle Type', 'Export Country']
+
+
+def lake_tariffs(folder, read_tables=read_summary_tables):
+    # The tariff tables of every workbook in one frame; read_tables can be swapped for a cached reader
+    frames = [read_tables(excel_file)['tariffs'] for excel_file in list_workbooks(folder)]
+    if not frames:
+        return pd.DataFrame(columns=['Export Country', 'Region', 'Import Country', *COUNTRY_TABLE_COLUMNS.values()])
+    tariffs = pd.concat(frames, ignore_index=True)
+    # Each workbook has its own country categories, which concat turns back into text
+    for column in ('Export Country', 'Region', 'Import Country'):
+        tariffs[column] = tariffs[column].astype('category')
+    return tariffs
+
+
+@metrics.timed('sourcing')
+def rank_sourcing(tariffs, import_countries=None):
+    # One row per (import country, vehicle type, export country) with its best route, ranked by the upper bound of the
+    # landed tariff and then the lower one. 'MFN Max.' and 'Saving' compare the route with the export country's MFN rate.
+    rows = tariffs if import_countries is None else tariffs[tariffs['Import Country'].isin(import_countries)]
+    low = rows['Tariff Min.'].to_numpy(dtype='float32', na_value=np.nan)
+    high = rows['Tariff Max.'].to_numpy(dtype='float32', na_value=np.nan)
+    is_mfn = (rows['Tariff Type'] == 'MFN').to_numpy()
+    is_fta = (rows['Tariff Type'] == 'FTA').to_numpy()
+
+    # A single rate may be written in either column
+    rate_max = np.where(np.isnan(high), low, high)
+    rate_min = np.where(np.isnan(low), high, low)
+    # Like the tariff chart, an FTA rate with a maximum of 0 and a positive minimum is out of scope
+    fta_in_scope = (high > 0) | ((low == 0) & (high == 0))
+    usable = ~np.isnan(rate_max) & rows['Vehicle Type'].notna().to_numpy() & (is_mfn | (is_fta & fta_in_scope))
+
+    options = pd.DataFrame({
+        'Import Country': rows['Import Country'].to_numpy()[usable],
+        'Vehicle Type': rows['Vehicle Type'].to_numpy()[usable],
+        'Export Country': rows['Export Country'].to_numpy()[usable],
+        'Route': rows['Tariff Type'].to_numpy()[usable],
+        'Tariff Min.': rate_min[usable],
+        'Tariff Max.': rate_max[usable],
+    })
+    options = options.astype({
+        'Import Country': 'category', 'Export Country': 'category',
+        'Vehicle Type': rows['Vehicle Type'].dtype, 'Route': rows['Tariff Type'].dtype,
+    })
+    # FTA comes after MFN in the tariff type order, so sorting the route descending prefers the FTA on a tie
+    options = options.sort_values(
+        ['Import Country', 'Vehicle Type', 'Tariff Max.', 'Tariff Min.', 'Route'],
+        ascending=[True, True, True, True, False], kind='stable',
+    )
+
+    best = options.drop_duplicates(SOURCING_KEYS)
+    mfn = options[options['Route'] == 'MFN'].drop_duplicates(SOURCING_KEYS)[SOURCING_KEYS + ['Tariff Max.']]
+    best = best.merge(mfn.rename(columns={'Tariff Max.': 'MFN Max.'}), on=SOURCING_KEYS, how='left', sort=False)
+    best['Saving'] = best['MFN Max.'] - best['Tariff Max.']
+    best.insert(0, 'Rank', best.groupby(['Import Country', 'Vehicle Type'], observed=True).cumcount() + 1)
+    return best
+
+
+def sourcing_options(ranking, import_countries, vehicle_types=None, top=None):
+    # Slice of a precomputed ranking: the options into some markets, optionally for some vehicle types and the best `top` only
+    rows = ranking[ranking['Import Country'].isin(import_countries)]
+    if vehicle_types is not None:
+        rows = rows[rows['Vehicle Type'].isin(vehicle_types)]
+    if top is not None:
+        rows = rows[rows['Rank'] <= top]
+    return rows
@@ -0,0 +1,95 @@
+import functools
+import importlib
+import importlib.util
+
+from fta_data import SUMMARY_TABLES, file_sha256, list_workbooks, read_summary_arrow, read_summary_tables
+from fta_metrics import metrics
+
+
+# Ad-hoc SQL over the whole data lake with an embedded DuckDB engine (optional dependency):
+#
+#   tables = lake_tables("FTA_data")
+#   query(tables, 'SELECT "Import Country", min("Tariff Max.") FROM tariffs WHERE "Tariff Type" = \'FTA\' GROUP BY 1')
+#
+# Every summary table (tariffs, tariff_issues, overview, negotiations) is a view over all export countries.
+# Compiled tables are scanned straight from their memory-mapped Feather files; workbooks without usable compiled
+# tables are summarized into DataFrames, which DuckDB also scans in place. Each query runs on its own connection
+# with file access disabled, so a query can't change the views other users see or touch the file system.
+
+# Rows returned by default, the SQL panel has no use for more
+DEFAULT_MAX_ROWS = 10000
+
+
+@functools.lru_cache(maxsize=None)
+def _duckdb():
+    try:
+        return importlib.import_module('duckdb')
+    except ImportError:
+        return None
+
+
+def sql_available():
+    # Checked without importing duckdb, so the app can offer the SQL view without paying for the import at startup
+    return importlib.util.find_spec('duckdb') is not None
+
+
+def lake_tables(folder, sha256s=None, read_tables=read_summary_tables):
+    # {table name: [per-workbook Arrow table or DataFrame, ...]}; sha256s ({excel_file: sha256}) saves re-hashing
+    # workbooks whose hash is already known, read_tables can be swapped for a cached reader
+    tables = {name: [] for name in SUMMARY_TABLES}
+    for excel_file in list_workbooks(folder):
+        sha256 = (sha256s or {}).get(excel_file) or file_sha256(excel_file)
+        workbook_tables = read_summary_arrow(excel_file, sha256)
+        if workbook_tables is None:
+            summary = read_tables(excel_file)
+            workbook_tables = {name: summary[name] for name in SUMMARY_TABLES if summary[name] is not None}
+        for name, table in workbook_tables.items():
+            tables[name].append(table)
+    return tables
+
+
+def connect(tables):
+    # A fresh in-memory connection with one view per table name over all of its parts
+    duckdb = _duckdb()
+    if duckdb is None:
+        raise RuntimeError("duckdb is required for SQL queries")
+    connection = duckdb.connect()
+    for name, parts in tables.items():
+        if not parts:
+            continue
+        for position, part in enumerate(parts):
+            connection.register(f"{name}_{position}", part)
+        # BY NAME lines up the columns of sheets whose layouts differ between workbooks
+        union = " UNION ALL BY NAME ".join(f'SELECT * FROM "{name}_{position}"' for position in range(len(parts)))
+        connection.execute(f'CREATE VIEW "{name}" AS {union}')
+    connection.execute("SET enable_external_access = false")
+    return connection
+
+
+@metrics.timed('sql')
+def query(tables, sql, max_rows=DEFAULT_MAX_ROWS):
+    # Result of one SQL statement as a DataFrame (at most max_rows rows, all rows when None)
+    connection = connect(tables)
+    try:
+        relation = connection.sql(sql)
+        if relation is None:
+            # Statements without a result set, e.g. SET
+            return None
+        if max_rows is not None:
+            relation = relation.limit(max_rows)
+        return relation.df()
+    finally:
+        connection.close()
+
+
+def table_columns(tables):
+    # {table name: [column names]} of the views, for listing the schema next to the query editor
+    columns = {}
+    for name, parts in tables.items():
+        seen = {}
+        for part in parts:
+            for column in getattr(part, 'column_names', None) or list(part.columns):
+                seen.setdefault(str(column), None)
+        if seen:
+            columns[name] = list(seen)
+    return columns
@@ -0,0 +1,160 @@
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+
+from fta_data import (
+    export_country_name, file_sha256, list_workbooks, read_sidecar_manifest, read_summary_tables_manifest,
+    sidecar_folder, summary_tables_folder, update_import_index, write_sidecar, write_summary_tables,
+)
+from fta_metrics import metrics
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Without watchdog (inotify on Linux) the catalog falls back to polling only
+    FileSystemEventHandler = object
+    Observer = None
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    path: str
+    export_country: str
+    mtime_ns: int
+    size: int
+    sha256: str
+
+
+class _WakeOnWorkbookEvent(FileSystemEventHandler):
+    def __init__(self, wake):
+        self._wake = wake
+
+    def on_any_event(self, event):
+        # Atomic saves (Excel, rsync) write a temporary file and move it onto the workbook, so the destination counts too
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            name = os.path.basename(os.fsdecode(path))
+            if name.endswith('.xlsx') and not name.startswith('~$'):
+                self._wake.set()
+
+
+class WorkbookCatalog:
+    # In-memory catalog of the FTA_data workbooks, kept current by a background thread.
+    # File system events (inotify via watchdog) wake the thread right away; it also polls every poll_interval
+    # seconds because events are not delivered for changes made by other hosts on a network mount.
+    # Only added or modified workbooks are hashed and reprocessed, deleted ones are dropped from the caches.
+
+    def __init__(self, folder, poll_interval=30.0, settle=2.0, compile_caches=True):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.compile_caches = compile_caches
+        self.version = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self.refresh(reprocess=False)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_WakeOnWorkbookEvent(self._wake), self.folder, recursive=False)
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name="fta-catalog", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        # Bring caches left over from before this process started up to date, then follow changes;
+        # a failed catch-up is retried on the next pass like a failed refresh
+        first_pass, caught_up = True, False
+        while not self._stop.is_set():
+            if not first_pass and self._wake.wait(timeout=self.poll_interval):
+                # Let a workbook that is still being copied settle before reading it
+                time.sleep(self.settle)
+            first_pass = False
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                if not caught_up:
+                    self._reprocess(self.entries().values(), [])
+                    caught_up = True
+                self.refresh()
+            except Exception:
+                pass  # E.g. the folder is briefly unavailable on a network mount; the next pass retries
+
+    def entries(self):
+        with self._lock:
+            return dict(self._entries)
+
+    def export_countries(self):
+        with self._lock:
+            return sorted({entry.export_country for entry in self._entries.values()})
+
+    def refresh(self, reprocess=True):
+        # Compare the folder with the catalog and reprocess only what changed; returns (added, changed, removed) file names
+        with self._lock:
+            known = dict(self._entries)
+
+        with metrics.stage('directory_scan'):
+            current = {}
+            added, changed = [], []
+            for excel_file in list_workbooks(self.folder):
+                name = os.path.basename(excel_file)
+                stat = os.stat(excel_file)
+                entry = known.get(name)
+                if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    current[name] = entry
+                    continue
+                sha256 = file_sha256(excel_file)
+                current[name] = CatalogEntry(excel_file, export_country_name(excel_file), stat.st_mtime_ns, stat.st_size, sha256)
+                if entry is None:
+                    added.append(name)
+                elif entry.sha256 != sha256:
+                    changed.append(name)
+        removed = [name for name in known if name not in current]
+
+        if reprocess and (added or changed or removed):
+            self._reprocess([current[name] for name in added + changed], [known[name] for name in removed])
+
+        with self._lock:
+            self._entries = current
+            if added or changed or removed:
+                self.version += 1
+        return added, changed, removed
+
+    def _reprocess(self, updated, removed):
+        for entry in updated if self.compile_caches else ():
+            for read_manifest, write in (
+                (read_sidecar_manifest, write_sidecar),
+                (read_summary_tables_manifest, write_summary_tables),
+            ):
+                if (read_manifest(entry.path) or {}).get('sha256') == entry.sha256:
+                    continue
+                try:
+                    write(entry.path, sha256=entry.sha256)
+                except Exception:
+                    # Without pyarrow, on a read-only folder or for a corrupt workbook the readers fall back to the
+                    # workbook itself and the app reports the error when it is opened; the watcher keeps running
+                    pass
+        for entry in removed:
+            shutil.rmtree(sidecar_folder(entry.path), ignore_errors=True)
+            shutil.rmtree(summary_tables_folder(entry.path), ignore_errors=True)
+        # The index update is incremental, it only re-reads the workbooks whose hash changed
+        update_import_index(self.folder)
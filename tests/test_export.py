@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fta_data import TARIFF_SCHEMA
+from fta_export import write_export
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def tariffs(notes):
+    return pd.DataFrame({
+        'Import Country': ['A', 'B'],
+        'Tariff Min.': np.array([5, np.nan], dtype='float32'),
+        'Exceptions/Notes': notes,
+        'EiF': pd.to_datetime(['2020-01-01', None]),
+    })
+
+
+@pytest.mark.parametrize('first_notes, second_notes', [
+    ([np.nan, np.nan], ['quota', None]),
+    (['quota', None], [np.nan, np.nan]),
+])
+def test_parquet_frames_with_different_dtypes(tmp_path, first_notes, second_notes):
+    # A workbook without any notes reads its notes column as all-missing floats, the next one as text
+    path = tmp_path / 'lake.parquet'
+    sheets = [('X', tariffs(first_notes)), ('Y', tariffs(second_notes))]
+    write_export(sheets, 'parquet', path, sheet_column='Export Country', schema=TARIFF_SCHEMA)
+
+    table = pq.read_table(path)
+    assert str(table.schema.field('Exceptions/Notes').type) == 'string'
+    assert str(table.schema.field('Tariff Min.').type) == 'float'
+    assert table.column('Exceptions/Notes').to_pylist().count('quota') == 1
+    assert table.column('Export Country').to_pylist() == ['X', 'X', 'Y', 'Y']
@@ -0,0 +1,19 @@
+import tracemalloc
+
+from fta_metrics import Metrics
+
+
+def test_nested_stage_keeps_the_outer_peak():
+    # The inner stage resets tracemalloc's peak; the allocation the outer stage made before it must still count
+    tracemalloc.start()
+    try:
+        metrics = Metrics()
+        with metrics.stage('outer'):
+            allocation = bytearray(10_000_000)
+            del allocation
+            with metrics.stage('inner'):
+                pass
+    finally:
+        tracemalloc.stop()
+    assert metrics._stages['outer']['peak_bytes'] >= 10_000_000
+    assert metrics._stages['inner']['peak_bytes'] < 10_000_000
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fta_projection import project_tariffs
+
+YEARS = list(range(2019, 2027))
+
+# (Tariff Type, Reduction Rate%, Tariff Reduction Years) of a 10% tariff with EiF in 2020, and its factor per year
+SCHEDULES = {
+    'rate only': ('FTA', 25, np.nan, [np.nan, 1, 0.75, 0.5, 0.25, 0, 0, 0]),
+    'years only': ('FTA', np.nan, 5, [np.nan, 1, 0.8, 0.6, 0.4, 0.2, 0, 0]),
+    'rate and years': ('FTA', 10, 3, [np.nan, 1, 0.9, 0.8, 0.7, 0.7, 0.7, 0.7]),
+    'no schedule': ('FTA', np.nan, np.nan, [1] * 8),
+    'MFN': ('MFN', 25, 4, [1] * 8),
+}
+
+
+@pytest.mark.parametrize('schedule', SCHEDULES.values(), ids=SCHEDULES.keys())
+def test_projected_factors(schedule):
+    tariff_type, rate, years, factors = schedule
+    tariffs = pd.DataFrame({
+        'Export Country': ['Japan'],
+        'Region': ['Europe'],
+        'Import Country': ['France'],
+        'Vehicle Type': ['BEV'],
+        'Tariff Type': [tariff_type],
+        'Tariff Min.': np.array([10], dtype='float32'),
+        'Tariff Max.': np.array([10], dtype='float32'),
+        'Tariff Reduction Years': np.array([years], dtype='float32'),
+        'Reduction Rate%': np.array([rate], dtype='float32'),
+        'EiF': pd.to_datetime(['2020-01-01']),
+    })
+    projection = project_tariffs(tariffs, first_year=YEARS[0], last_year=YEARS[-1])
+    assert projection['Year'].tolist() == YEARS
+    np.testing.assert_allclose(projection['Tariff Min.'], 10 * np.array(factors), rtol=1e-6)
+    np.testing.assert_allclose(projection['Tariff Max.'], 10 * np.array(factors), rtol=1e-6)
+    # Only rows with a schedule wait for EiF
+    assert (projection['Scheduled'] == np.isnan(factors[0])).all()
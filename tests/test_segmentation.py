@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from fta_data import segment_region_sheet
+
+
+def iterrows_segmentation(sheet_df):
+    # The row-by-row segmentation segment_region_sheet replaced, as it was in fta.py
+    country_dfs = {}
+    current_country = None
+    for _, row in sheet_df.iterrows():
+        country_region = row['Country/Region']
+        if pd.notnull(country_region):
+            current_country = country_region
+
+        if current_country not in country_dfs:
+            country_dfs[current_country] = pd.DataFrame(columns=['Vehicle Type', 'Tariff Type', 'Tariff Min.', 'Tariff Max.', 'Exceptions/Notes', 'Tariff Reduction Years', 'Reduction Rate%', 'EiF'])
+
+        # Fill in the missing Vehicle Type values
+        if pd.isnull(row['Vehicle Type']):
+            row['Vehicle Type'] = country_dfs[current_country]['Vehicle Type'].iloc[-1] if len(country_dfs[current_country]) > 0 else ''
+
+        country_dfs[current_country] = pd.concat([country_dfs[current_country], pd.DataFrame({
+            'Vehicle Type': [row['Vehicle Type']],
+            'Tariff Type': [row['Tariff Type']],
+            'Tariff Min.': [row['Tariff Rate']],
+            'Tariff Max.': [row['Unnamed: 4']],
+            'Exceptions/Notes': [row['Exceptions/Notes']],
+            'Tariff Reduction Years': [row['Tariff Reduction Years']],
+            'Reduction Rate%': [row['Reduction Rate%']],
+            'EiF': [row['EiF']]
+        })], ignore_index=True)
+    return country_dfs
+
+
+def region_sheet(rows):
+    columns = [
+        'Country/Region', 'Vehicle Type', 'Tariff Type', 'Tariff Rate', 'Unnamed: 4', 'Exceptions/Notes',
+        'Tariff Reduction Years', 'Reduction Rate%', 'EiF', 'LC 2024',
+    ]
+    return pd.DataFrame([row + [np.nan] * (len(columns) - len(row)) for row in rows], columns=columns)
+
+
+def test_matches_iterrows_segmentation():
+    sheet_df = region_sheet([
+        ['France', 'BEV', 'MFN', 10],
+        [np.nan, np.nan, 'FTA', '0-5', np.nan, 'quota', 5, 20, pd.Timestamp('2021-01-01')],
+        [np.nan, 'ICE', 'MFN', 10, 12],
+        [np.nan, np.nan, 'FTA', 'NA'],
+        ['Italy', np.nan, 'MFN', 7.5],
+        [np.nan, 'PHEV', 'FTA', 0, 0],
+        # A country reappearing further down joins its first block
+        ['France', np.nan, 'MFN', 3],
+        ['Spain', 'HEV', 'MFN', 4],
+    ])
+    expected = iterrows_segmentation(sheet_df)
+    tables = segment_region_sheet(sheet_df)
+    assert list(tables) == list(expected)
+    for country, table in tables.items():
+        pd.testing.assert_frame_equal(table, expected[country], check_dtype=False)
+
+
+def test_rows_above_the_first_country_are_dropped():
+    # The old loop kept them under a None key, which then failed where the country name was used
+    sheet_df = region_sheet([[np.nan, 'BEV', 'MFN', 1], ['France', 'BEV', 'MFN', 10]])
+    assert None in iterrows_segmentation(sheet_df)
+    assert list(segment_region_sheet(sheet_df)) == ['France']
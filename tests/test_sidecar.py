@@ -0,0 +1,42 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from fta_data import read_sidecar, write_sidecar
+
+openpyxl = pytest.importorskip('openpyxl')
+pytest.importorskip('pyarrow')
+
+
+def write_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Europe'
+    for row_number, row in enumerate(rows, 1):
+        for column_number, value in enumerate(row, 1):
+            if value is not None:
+                sheet.cell(row_number, column_number, value)
+    workbook.save(path)
+    return path
+
+
+def test_sidecar_round_trips_read_excel(tmp_path):
+    # Mixed columns keep the type of every cell, date and time headers stay dates and times
+    path = write_workbook(tmp_path / 'japan.xlsx', [
+        ['Country/Region', 'Mixed', 'Tariff', datetime.datetime(2024, 1, 1), datetime.time(8, 0), 'Tariff'],
+        ['France', 10, 2.5, 'a', None, 1],
+        ['Italy', 'text', 'NA', 3, True, 2],
+        ['Spain', datetime.datetime(2021, 1, 1), 7, datetime.time(10, 30), 4.5, 3],
+        ['Greece', datetime.time(9, 15, 30), None, None, 'x', 4],
+    ])
+    expected = pd.read_excel(path, sheet_name=None)
+    write_sidecar(path, workbook=expected)
+    sheets = read_sidecar(path)
+    assert list(sheets) == list(expected)
+    for name, sheet_df in sheets.items():
+        assert list(sheet_df.columns) == list(expected[name].columns)
+        assert [type(column) for column in sheet_df.columns] == [type(column) for column in expected[name].columns]
+        pd.testing.assert_frame_equal(sheet_df, expected[name])
+        for column in range(sheet_df.shape[1]):
+            assert sheet_df.iloc[:, column].map(type).tolist() == expected[name].iloc[:, column].map(type).tolist()
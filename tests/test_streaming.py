@@ -0,0 +1,74 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from fta_data import country_block_bounds, iter_country_blocks, read_sheet
+
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def write_sheet(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Europe'
+    for row_number, row in enumerate(rows, 1):
+        for column_number, value in enumerate(row, 1):
+            if value is not None:
+                sheet.cell(row_number, column_number, value)
+    workbook.save(path)
+    return path
+
+
+HEADER = ['Country/Region', 'Vehicle Type', 'Tariff Type', 'Tariff Rate', 'EiF']
+
+SHEETS = {
+    'blank and NA rows': [
+        HEADER,
+        ['France', 'BEV', 'MFN', 10],
+        [None, None, None, None],
+        ['NA', 'N/A', None, None],
+        [None, 'ICE', 'FTA', '0-5', datetime.datetime(2021, 1, 1)],
+        ['Germany', 'BEV', 'MFN', 10],
+        [None, None, None, None],
+    ],
+    'data past the header': [
+        HEADER,
+        ['France', 'BEV', 'MFN', 10],
+        [None, None, None, None, None, 'note'],
+        ['Germany', 'ICE', 'FTA', 5],
+    ],
+    'leading blank row': [
+        [None, None, None],
+        HEADER,
+        ['France', 'BEV', 'MFN', 10],
+    ],
+    'repeated and empty labels': [
+        ['Country/Region', 'Tariff', None, 'Tariff'],
+        ['France', 10, ' ', 5],
+        ['Italy', None, 'x', None],
+    ],
+}
+
+
+@pytest.mark.parametrize('rows', SHEETS.values(), ids=SHEETS.keys())
+def test_read_sheet_matches_read_excel(tmp_path, rows):
+    path = write_sheet(tmp_path / 'sheet.xlsx', rows)
+    expected = pd.read_excel(path, sheet_name='Europe')
+    pd.testing.assert_frame_equal(read_sheet(path, 'Europe'), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('rows', SHEETS.values(), ids=SHEETS.keys())
+def test_country_blocks_match_read_excel(tmp_path, rows):
+    # The import index stores the row offsets of pd.read_excel, the streamed blocks have to land on the same rows
+    path = write_sheet(tmp_path / 'sheet.xlsx', rows)
+    expected = pd.read_excel(path, sheet_name='Europe')
+    if 'Country/Region' not in expected.columns:
+        return
+    bounds = [(country, start, stop) for country, start, stop in country_block_bounds(expected)]
+    blocks = [(country, rows.index[0], rows.index[-1] + 1) for country, rows in iter_country_blocks(path, 'Europe')]
+    assert blocks == bounds
+    for start, stop in [(start, stop) for _, start, stop in bounds]:
+        pd.testing.assert_frame_equal(
+            read_sheet(path, 'Europe', nrows=stop).iloc[start:stop], expected.iloc[start:stop], check_dtype=False,
+        )
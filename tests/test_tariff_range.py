@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fta_data import parse_tariff_range
+
+
+def convert_range_to_numeric(value):
+    # The per-cell parser parse_tariff_range replaced, as it was in fta.py
+    if isinstance(value, str) and '-' in value:
+        try:
+            values = []
+            for v in value.split('-'):
+                v_strip = v.strip().upper()
+                if v_strip == 'NA':
+                    values.append('NA')
+                else:
+                    values.append(round(float(v_strip), 2))
+            return values
+        except ValueError:
+            return ['NA', 'NA']
+    elif isinstance(value, str) and value.strip().upper() == 'NA':
+        return ['NA', 'NA']
+    else:
+        try:
+            return [round(float(value), 2), round(float(value), 2)]
+        except ValueError:
+            return ['NA', 'NA']
+
+
+def expected_bounds(values):
+    # The old parser's 'NA' is NaN now
+    rows = [[np.nan if bound == 'NA' else bound for bound in convert_range_to_numeric(value)] for value in values]
+    return pd.DataFrame(rows, columns=['min', 'max'], dtype='float64')
+
+
+COLUMNS = {
+    'ranges': ['2.5-10', '0 - 5', 'NA-5', '5-NA', 'na - na', '1.234-2.345'],
+    'unreadable': ['-5', '5-', 'abc', 'x-5', '', 'NA'],
+    'padded text': [' 5 ', '10', ' 2.5 - 3 '],
+    'numbers': [5, 2.5, np.nan, 10],
+    'mixed objects': [5, '1-2', np.nan, 'NA', 7.125, ' 3 '],
+    'all missing': [np.nan, np.nan],
+}
+
+
+@pytest.mark.parametrize('values', COLUMNS.values(), ids=COLUMNS.keys())
+def test_matches_convert_range_to_numeric(values):
+    pd.testing.assert_frame_equal(parse_tariff_range(pd.Series(values, dtype=object)), expected_bounds(values))
+
+
+def test_more_than_two_bounds_are_unreadable():
+    # The old parser returned three values for "1-2-3", which broke the two-column assignment
+    assert len(convert_range_to_numeric('1-2-3')) == 3
+    assert parse_tariff_range(pd.Series(['1-2-3'])).isna().all(axis=None)